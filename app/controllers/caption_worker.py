@@ -0,0 +1,258 @@
+# caption_worker.py
+"""
+Long-lived caption worker that keeps BLIP loaded between runs.
+
+The worker listens on a local TCP socket and speaks JSON lines:
+    {"op": "ping"}
+        -> {"ok": true, "model": "..."}
+    {"op": "caption", "paths": [...], "batch_size": 8}
+        -> one {"path", "caption"|"error"} line per image, then {"done": true, "stats": {...}}
+    {"op": "shutdown"}
+        -> {"ok": true}, then the worker exits
+
+Run from the app/ folder:
+    python -m controllers.caption_worker serve
+    python -m controllers.caption_worker caption --test
+    python -m controllers.caption_worker stop
+"""
+import argparse
+import json
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from utils.prefetch import format_stats
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 50517
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # seconds without a request before the worker exits
+STARTUP_TIMEOUT = 600  # first start may need to download the model
+
+
+# -----------------------------
+# SERVER
+# -----------------------------
+class _CaptionRequestHandler(socketserver.StreamRequestHandler):
+    def send(self, payload: dict):
+        self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.server.touch()
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.send({"error": f"Invalid request: {e}"})
+                continue
+
+            op = request.get("op")
+            if op == "ping":
+                self.send({"ok": True, "model": self.server.captioner.model_name})
+            elif op == "caption":
+                paths = [Path(p) for p in request.get("paths", [])]
+                captions = self.server.captioner.caption_paths(paths, batch_size=request.get("batch_size"))
+                for image_path, caption, error in captions:
+                    self.server.touch()
+                    if error:
+                        self.send({"path": str(image_path), "error": error})
+                    else:
+                        self.send({"path": str(image_path), "caption": caption})
+                self.send({"done": True, "stats": self.server.captioner.last_stats})
+            elif op == "shutdown":
+                self.send({"ok": True})
+                self.server.stop_requested = True
+                return
+            else:
+                self.send({"error": f"Unknown op: {op}"})
+
+
+class CaptionWorkerServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+    def __init__(self, address, captioner, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        super().__init__(address, _CaptionRequestHandler)
+        self.captioner = captioner
+        self.idle_timeout = idle_timeout
+        self.stop_requested = False
+        self.timeout = 1.0  # poll interval for handle_request()
+        self.touch()
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def serve_until_idle(self):
+        """Handle requests one at a time until shut down or idle for idle_timeout seconds."""
+        while not self.stop_requested:
+            if time.monotonic() - self.last_activity > self.idle_timeout:
+                print(f"Caption worker idle for {self.idle_timeout:.0f}s, shutting down.")
+                break
+            self.handle_request()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          idle_timeout: float = DEFAULT_IDLE_TIMEOUT, batch_size: int | None = None):
+    """Load BLIP once, then serve caption jobs until idle."""
+    from controllers.test_ai_controller import BlipCaptioner, DEFAULT_BATCH_SIZE
+
+    # The socket is only opened once the model is ready, so a successful ping means "ready"
+    captioner = BlipCaptioner(batch_size=batch_size or DEFAULT_BATCH_SIZE)
+    with CaptionWorkerServer((host, port), captioner, idle_timeout=idle_timeout) as server:
+        print(f"Caption worker listening on {host}:{port}")
+        server.serve_until_idle()
+    print("Caption worker stopped.")
+
+
+# -----------------------------
+# CLIENT
+# -----------------------------
+class CaptionWorkerClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Talk to a running caption worker. Same caption()/caption_paths() interface as BlipCaptioner."""
+        self.host = host
+        self.port = port
+        self.last_stats = None
+
+    def _request(self, payload: dict, connect_timeout: float = 2.0):
+        """Send one request and yield each JSON line the worker streams back."""
+        with socket.create_connection((self.host, self.port), timeout=connect_timeout) as sock:
+            sock.settimeout(None)  # captioning can take a while
+            sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as stream:
+                for line in stream:
+                    yield json.loads(line)
+
+    def ping(self) -> bool:
+        try:
+            return any(reply.get("ok") for reply in self._request({"op": "ping"}, connect_timeout=0.5))
+        except OSError:
+            return False
+
+    def caption_paths(self, image_paths, batch_size: int | None = None):
+        """Yield (image_path, caption, error) as the worker finishes each image."""
+        paths = [str(p) for p in image_paths]
+        if not paths:
+            return
+        for reply in self._request({"op": "caption", "paths": paths, "batch_size": batch_size}):
+            if reply.get("done"):
+                self.last_stats = reply.get("stats")
+                if self.last_stats:
+                    print(format_stats(self.last_stats))
+                return
+            if "path" not in reply:
+                raise RuntimeError(reply.get("error", "Unexpected reply from caption worker"))
+            yield Path(reply["path"]), reply.get("caption"), reply.get("error")
+
+    def caption(self, image_path: Path) -> str:
+        for _, caption, error in self.caption_paths([image_path]):
+            if error:
+                raise RuntimeError(error)
+            return caption
+        raise RuntimeError(f"No caption returned for {image_path}")
+
+    def shutdown(self) -> bool:
+        try:
+            return any(reply.get("ok") for reply in self._request({"op": "shutdown"}))
+        except OSError:
+            return False
+
+
+def ensure_worker(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> CaptionWorkerClient | None:
+    """
+    Return a client for a running worker, starting one in the background if needed.
+    Returns None when a worker can't be spawned (e.g. frozen PyInstaller build).
+    """
+    client = CaptionWorkerClient(host, port)
+    if client.ping():
+        return client
+
+    if getattr(sys, "frozen", False):
+        return None
+
+    print("Starting caption worker ...")
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "controllers.caption_worker", "serve",
+            "--host", host, "--port", str(port), "--idle-timeout", str(idle_timeout),
+        ],
+        cwd=APP_DIR,
+        stdin=subprocess.DEVNULL,
+        **kwargs,
+    )
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if client.ping():
+            return client
+        if proc.poll() is not None:
+            raise RuntimeError(f"Caption worker exited during startup (code {proc.returncode})")
+        time.sleep(0.5)
+
+    raise TimeoutError(f"Caption worker did not start within {STARTUP_TIMEOUT}s")
+
+
+def ensure_worker_in_background(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                                idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> Future:
+    """
+    Run ensure_worker() on a background thread, so a GUI isn't blocked while the model loads.
+    The returned Future holds its client (or None), or the startup error; poll it with done().
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(ensure_worker(host, port, idle_timeout))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="caption-worker-start", daemon=True).start()
+    return future
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent BLIP caption worker")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Load BLIP and serve caption jobs until idle")
+    serve_parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                              help="Seconds without requests before exiting")
+    serve_parser.add_argument("--batch-size", type=int, default=None, help="Default images per forward pass")
+
+    caption_parser = sub.add_parser("caption", help="Caption the AI pool through the worker")
+    caption_parser.add_argument("--test", action="store_true", help="Use test directories and CSVs")
+    caption_parser.add_argument("--batch-size", type=int, default=8, help="Images per forward pass")
+
+    sub.add_parser("stop", help="Ask a running worker to shut down")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.idle_timeout, args.batch_size)
+    elif args.command == "caption":
+        from controllers.test_ai_controller import AIController
+        controller = AIController(
+            test_mode=args.test,
+            captioner=ensure_worker(args.host, args.port),
+            batch_size=args.batch_size,
+        )
+        controller.caption_all_images()
+    elif args.command == "stop":
+        stopped = CaptionWorkerClient(args.host, args.port).shutdown()
+        print("Caption worker stopped." if stopped else "No caption worker running.")
@@ -3,8 +3,11 @@ import argparse
 from pathlib import Path
 import pandas as pd
 from PIL import Image
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
+from utils.photo_index import get_photo_index
+from utils.batch_clean import find_unrendered, render_derivatives
+from utils.catalog import open_catalog
+from utils.edit_recipes import get_derivative, get_recipe_store
+from utils.prefetch import PrefetchPipeline, PipelineStats, format_stats
 from utils.paths import (
     DATA_DIR,
     DATA_TEST_DIR,
@@ -13,29 +16,31 @@ from utils.paths import (
 )
 import json
 
+MODEL_NAME = "Salesforce/blip-image-captioning-large"
 
-class AIController:
-    def __init__(self, test_mode: bool = False):
-        """Initialize AI controller using BLIP-Large (Salesforce/blip-image-captioning-large)."""
 
-        self.test_mode = test_mode
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_PREFETCH_WORKERS = 2
 
-        # -------------------------
-        # Directories
-        # -------------------------
-        if test_mode:
-            self.data_dir = DATA_TEST_DIR
-            self.photo_dir = PHOTOS_TEST_RENAMED_DIR
-            self.ai_pool_file = DATA_TEST_DIR / "ai_pool_test.json"
-        else:
-            self.data_dir = DATA_DIR
-            self.photo_dir = PHOTOS_RENAMED_DIR
-            self.ai_pool_file = DATA_DIR / "ai_pool.json"
 
-        # -------------------------
-        # Load BLIP-Large
-        # -------------------------
-        model_name = "Salesforce/blip-image-captioning-large"
+def _is_out_of_memory(error: Exception) -> bool:
+    """True for CPU/GPU allocation failures raised while running the model."""
+    return isinstance(error, MemoryError) or "out of memory" in str(error).lower()
+
+
+class BlipCaptioner:
+    def __init__(self, model_name: str = MODEL_NAME, batch_size: int = DEFAULT_BATCH_SIZE,
+                 prefetch_workers: int = DEFAULT_PREFETCH_WORKERS):
+        """Load BLIP-Large once so it can caption any number of images."""
+        # torch/transformers are imported here so importing this module stays cheap
+        import torch
+        from transformers import BlipProcessor, BlipForConditionalGeneration
+
+        self.torch = torch
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.prefetch_workers = prefetch_workers
+        self.last_stats = None
         print(f"Loading BLIP model: {model_name} ...")
 
         self.processor = BlipProcessor.from_pretrained(model_name)
@@ -50,6 +55,123 @@ class AIController:
 
         print("BLIP model loaded successfully.\n")
 
+    def _generate(self, pixel_values) -> list[str]:
+        with self.torch.no_grad():
+            output = self.model.generate(
+                pixel_values=pixel_values.to(self.device),
+                max_new_tokens=60
+            )
+
+        return self.processor.batch_decode(output, skip_special_tokens=True)
+
+    def caption_images(self, images: list) -> list[str]:
+        """Caption a list of RGB PIL images in one forward pass."""
+        # The processor resizes every image to the model's input size, so they stack into one tensor
+        inputs = self.processor(images=images, return_tensors="pt")
+        return self._generate(inputs["pixel_values"])
+
+    def caption_tensors(self, pixel_values: list) -> list[str]:
+        """Caption already-preprocessed images (one pixel tensor per image) in one forward pass."""
+        return self._generate(self.torch.stack(pixel_values))
+
+    def caption(self, image_path: Path) -> str:
+        """Generate caption using BLIP-Large."""
+        image = Image.open(image_path).convert("RGB")
+        return self.caption_images([image])[0]
+
+    def _load_pixels(self, image_path: Path, stats: PipelineStats):
+        """Decode and preprocess one image (runs on a prefetch thread)."""
+        with stats.timed("decode"):
+            image = Image.open(image_path).convert("RGB")
+        with stats.timed("preprocess"):
+            return self.processor(images=image, return_tensors="pt")["pixel_values"][0]
+
+    def _caption_adaptive(self, pixel_values: list) -> list[tuple[str | None, str | None]]:
+        """
+        Caption a batch, returning (caption, error) per image.
+        Halves the batch (and the batch size for the rest of the run) when memory runs out,
+        and falls back to one image at a time if a batch fails for another reason.
+        """
+        try:
+            return [(caption, None) for caption in self.caption_tensors(pixel_values)]
+        except Exception as e:
+            if len(pixel_values) == 1:
+                return [(None, str(e))]
+            if _is_out_of_memory(e):
+                self._run_batch_size = max(1, len(pixel_values) // 2)
+                print(f"⚠ Out of memory with batch of {len(pixel_values)}, shrinking to {self._run_batch_size}")
+
+        results = []
+        step = self._run_batch_size if self._run_batch_size < len(pixel_values) else 1
+        for i in range(0, len(pixel_values), step):
+            results.extend(self._caption_adaptive(pixel_values[i:i + step]))
+        return results
+
+    def _caption_batch(self, batch: list, stats: PipelineStats):
+        with stats.timed("inference"):
+            results = self._caption_adaptive([pixels for _, pixels in batch])
+        for (image_path, _), (caption, error) in zip(batch, results):
+            yield image_path, caption, error
+
+    def caption_paths(self, image_paths, batch_size: int | None = None):
+        """
+        Yield (image_path, caption, error) for each image in batches, continuing past failures.
+        Upcoming images are decoded and preprocessed on a thread pool while the model runs.
+        """
+        self._run_batch_size = max(1, batch_size or self.batch_size)
+        stats = PipelineStats()
+        pipeline = PrefetchPipeline(
+            lambda image_path: self._load_pixels(image_path, stats),
+            workers=self.prefetch_workers,
+            max_pending=2 * self._run_batch_size,  # next batch decodes while this one runs
+            stats=stats,
+        )
+
+        batch = []
+        for image_path, pixels, error in pipeline.run(image_paths):
+            if error:
+                yield image_path, None, error
+                continue
+
+            batch.append((image_path, pixels))
+            if len(batch) >= self._run_batch_size:
+                yield from self._caption_batch(batch, stats)
+                batch = []
+
+        if batch:
+            yield from self._caption_batch(batch, stats)
+
+        self.last_stats = stats.as_dict()
+        print(format_stats(self.last_stats))
+
+
+class AIController:
+    def __init__(self, test_mode: bool = False, captioner=None, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Initialize AI controller using BLIP-Large (Salesforce/blip-image-captioning-large).
+
+        captioner: anything with caption()/caption_paths(), e.g. a CaptionWorkerClient
+                   connected to a running caption worker. Loads BLIP in-process if None.
+        batch_size: number of images captioned per forward pass
+        """
+
+        self.test_mode = test_mode
+        self.batch_size = batch_size
+        self.recipes = get_recipe_store(test_mode)
+        self.catalog = open_catalog(test_mode)  # None unless the SQLite catalog is enabled
+
+        # -------------------------
+        # Directories
+        # -------------------------
+        if test_mode:
+            self.data_dir = DATA_TEST_DIR
+            self.photo_dir = PHOTOS_TEST_RENAMED_DIR
+            self.ai_pool_file = DATA_TEST_DIR / "ai_pool_test.json"
+        else:
+            self.data_dir = DATA_DIR
+            self.photo_dir = PHOTOS_RENAMED_DIR
+            self.ai_pool_file = DATA_DIR / "ai_pool.json"
+
         # -------------------------
         # Load AI pool
         # -------------------------
@@ -61,23 +183,17 @@ class AIController:
 
         print(f"Loaded {len(self.ai_pool_ids)} IDs from AI pool.")
 
+        # -------------------------
+        # Load BLIP-Large (unless a worker already holds it)
+        # -------------------------
+        self.captioner = captioner if captioner is not None else BlipCaptioner(batch_size=batch_size)
+
     # ------------------------------------------------
     # Generate caption
     # ------------------------------------------------
     def generate_caption(self, image_path: Path) -> str:
         """Generate caption using BLIP-Large."""
-        image = Image.open(image_path).convert("RGB")
-
-        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
-
-        with torch.no_grad():
-            output = self.model.generate(
-                **inputs,
-                max_new_tokens=60
-            )
-
-        caption = self.processor.decode(output[0], skip_special_tokens=True)
-        return caption
+        return self.captioner.caption(image_path)
 
     # ------------------------------------------------
     def remove_captioned_id(self, image_id: str):
@@ -101,15 +217,17 @@ class AIController:
             print(f"No CSV files found in {self.data_dir}")
             return captioned_ids
 
-        all_photos = list(self.photo_dir.glob("*.*"))
-        if all_photos:
-            print(f"Found {len(all_photos)} image files in {self.photo_dir}")
+        photo_index = get_photo_index(self.photo_dir)
+        if len(photo_index):
+            print(f"Found {len(photo_index)} image files in {self.photo_dir}")
         else:
             print(f"No images found in photo directory: {self.photo_dir}")
 
+        catalog_names = set(self.catalog.dataset_names()) if self.catalog is not None else set()
         for csv_path in csv_files:
             print(f"\nProcessing CSV: {csv_path.name}")
-            df = pd.read_csv(csv_path)
+            in_catalog = csv_path.stem in catalog_names
+            df = self.catalog.get_dataframe(csv_path.stem) if in_catalog else pd.read_csv(csv_path)
 
             if "ID" not in df.columns:
                 print(f"CSV missing ID column: {csv_path}")
@@ -117,35 +235,69 @@ class AIController:
 
             if "Description" not in df.columns:
                 df["Description"] = ""
+                if in_catalog:
+                    self.catalog.add_column(csv_path.stem, "Description")
 
             # Filter rows still needing captions
             df_pool = df[df["ID"].astype(str).isin(self.ai_pool_ids)]
 
+            # Match image files first so the captioner can work through them in one go
+            matched = []
             for idx, row in df_pool.iterrows():
                 image_id = str(row["ID"])
 
                 # Match image file
-                matches = list(self.photo_dir.glob(f"{image_id}.*"))
-                if not matches:
+                image_path = photo_index.get(image_id)
+                if image_path is None:
                     print(f"Skipping {image_id}: image not found")
                     continue
+                matched.append((idx, image_id, image_path))
 
-                image_path = matches[0]
+            # Photos with a recipe are captioned cleaned; render the missing derivatives on all cores now
+            todo, _ = find_unrendered([image_path for _, _, image_path in matched], self.recipes)
+            failed = set()
+            if todo:
+                print(f"Rendering {len(todo)} cleaned photos before captioning")
+                failed = set(render_derivatives(todo)[1])
 
+            pending = {}
+            for idx, image_id, image_path in matched:
                 try:
-                    caption = self.generate_caption(image_path)
-                    df.at[idx, "Description"] = caption
-                    captioned_ids.append(image_id)
+                    image_path = None if image_path.name in failed else get_derivative(image_path, self.recipes)
+                except Exception as e:
+                    image_path = None
+                    print(f"❌ {image_id}: {e}")
+                if image_path is None:
+                    print(f"Skipping {image_id}: cleaned image could not be rendered")
+                    continue
 
-                    print(f"Captioned {image_id}: {caption}")
+                pending[image_path] = (idx, image_id)
 
-                    self.remove_captioned_id(image_id)
+            captions = self.captioner.caption_paths(list(pending), batch_size=self.batch_size)
+            for image_path, caption, error in captions:
+                idx, image_id = pending[Path(image_path)]
+                if error:
+                    print(f"❌ Error captioning {image_id}: {error}")
+                    continue
 
-                except Exception as e:
-                    print(f"❌ Error captioning {image_id}: {e}")
+                if in_catalog:
+                    try:
+                        self.catalog.update_row(csv_path.stem, image_id, {"Description": caption})
+                    except ValueError as e:
+                        print(f"❌ Could not save caption for {image_id}: {e}")
+                        continue
+                df.at[idx, "Description"] = caption
+                captioned_ids.append(image_id)
+
+                print(f"Captioned {image_id}: {caption}")
+
+                self.remove_captioned_id(image_id)
 
-            df.to_csv(csv_path, index=False)
-            print(f"Updated CSV saved: {csv_path}")
+            if in_catalog:
+                print(f"Captions saved to catalog: {csv_path.stem}")
+            else:
+                df.to_csv(csv_path, index=False)
+                print(f"Updated CSV saved: {csv_path}")
 
         print("\n✅ Captioning complete.")
         print(f"Remaining IDs in pool: {len(self.ai_pool_ids)}")
@@ -156,7 +308,8 @@ class AIController:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="AIController using BLIP-Large captioning")
     parser.add_argument("--test", action="store_true", help="Use test directories and CSVs")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Images per forward pass")
     args = parser.parse_args()
 
-    controller = AIController(test_mode=args.test)
+    controller = AIController(test_mode=args.test, batch_size=args.batch_size)
     controller.caption_all_images()
@@ -1,8 +1,10 @@
 from views.main_window import PhotoDataApp
+import multiprocessing
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent))
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # derivatives are rendered on a process pool, also in the bundled app
     app = PhotoDataApp()
     app.mainloop()
@@ -0,0 +1,378 @@
+# scripts/benchmarks.py
+"""
+Performance benchmarks for the Metadata Creator.
+
+Run from the app/ folder, e.g.:
+    python -m scripts.benchmarks startup
+    python -m scripts.benchmarks variants
+    python -m scripts.benchmarks adjust --megapixels 10 40 100
+    python -m scripts.benchmarks csv-load --files 8 --rows 100000
+    python -m scripts.benchmarks pool-rebuild --files 8 --rows 100000
+"""
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must never be imported just to show the main window
+HEAVY_MODULES = ("torch", "torchvision", "transformers")
+
+
+# -----------------------------
+# STARTUP
+# -----------------------------
+def _startup_probe():
+    """Import the GUI, open the main window and report timings as JSON (runs in a child process)."""
+    start = time.perf_counter()
+    from views.main_window import PhotoDataApp
+    imported = time.perf_counter()
+
+    app = PhotoDataApp()
+    result = {"import_s": imported - start}
+
+    def on_first_frame():
+        result["first_frame_s"] = time.perf_counter() - start
+        result["heavy_modules"] = sorted(
+            name for name in sys.modules if name.split(".")[0] in HEAVY_MODULES
+        )
+        app.destroy()
+
+    # Fires once mainloop has processed its first round of events
+    app.after(0, on_first_frame)
+    app.mainloop()
+    print(json.dumps(result))
+
+
+def run_startup_benchmark(runs: int = 3, budget: float = 1.0) -> bool:
+    """
+    Launch the GUI in fresh interpreters and time imports and the first mainloop frame.
+    Returns False if a heavy module was imported or the budget (seconds) was exceeded.
+    """
+    ok = True
+    for i in range(runs):
+        wall_start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.benchmarks", "_startup-probe"],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+        )
+        wall = time.perf_counter() - wall_start
+        if proc.returncode != 0:
+            print(f"❌ Startup probe failed:\n{proc.stderr}")
+            return False
+
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"Run {i + 1}: import {result['import_s']:.3f}s, "
+            f"first frame {result['first_frame_s']:.3f}s, process {wall:.3f}s"
+        )
+
+        if result["heavy_modules"]:
+            print(f"❌ Heavy modules loaded at startup: {', '.join(result['heavy_modules'])}")
+            ok = False
+        if result["first_frame_s"] > budget:
+            print(f"❌ First frame took {result['first_frame_s']:.3f}s (budget {budget:.3f}s)")
+            ok = False
+
+    if ok:
+        print("✅ Startup benchmark passed.")
+    return ok
+
+
+# -----------------------------
+# VARIANT ROW INSERTION
+# -----------------------------
+def _legacy_insert_variants(df, row_plan, set_temporal=False, temporal_value=None):
+    """The old per-variant scan + concat, kept only as a baseline for the benchmark."""
+    import pandas as pd
+
+    for entry in row_plan:
+        base_row_idx = df.index[df["ID"] == entry["base_id"]]
+        if base_row_idx.empty:
+            continue
+        base_row_idx = base_row_idx[0]
+        if "Title" in df.columns:
+            df.at[base_row_idx, "Title"] = entry["title"]
+        if set_temporal and "Temporal Coverage" in df.columns:
+            df.at[base_row_idx, "Temporal Coverage"] = temporal_value
+
+        insert_pos = base_row_idx + 1
+        for variant in entry["variants"]:
+            base_row = df.loc[base_row_idx].copy()
+            base_row["ID"] = variant["id"]
+            if "Title" in df.columns:
+                base_row["Title"] = variant["title"]
+            if set_temporal and "Temporal Coverage" in df.columns:
+                base_row["Temporal Coverage"] = temporal_value
+
+            top = df.iloc[:insert_pos]
+            bottom = df.iloc[insert_pos:]
+            df = pd.concat([top, base_row.to_frame().T, bottom]).reset_index(drop=True)
+            insert_pos += 1
+    return df
+
+
+def run_variant_benchmark(rows: int = 50_000, variant_ratio: float = 0.2) -> bool:
+    """Compare the old quadratic variant insertion with apply_row_plan on a synthetic CSV."""
+    import pandas as pd
+    from utils.photo_variant_handler import apply_row_plan
+
+    ids = [f"ABC{i:05d}" for i in range(rows)]
+    df = pd.DataFrame({
+        "ID": ids,
+        "Title": [None] * rows,
+        "Description": [f"Description {i}" for i in range(rows)],
+        "Temporal Coverage": [None] * rows,
+    })
+    variant_every = max(1, round(1 / variant_ratio)) if variant_ratio > 0 else rows + 1
+    row_plan = [
+        {
+            "base_id": identifier,
+            "title": f"scan_{i}.jpg",
+            "variants": [{"id": f"{identifier}_A", "title": f"scan_{i}_A.jpg"}] if i % variant_every == 0 else [],
+        }
+        for i, identifier in enumerate(ids)
+    ]
+    n_variants = sum(len(entry["variants"]) for entry in row_plan)
+    print(f"{rows} rows, {n_variants} variants")
+
+    start = time.perf_counter()
+    new_df = apply_row_plan(df, row_plan, set_temporal=True, temporal_value="1950-1959")
+    new_s = time.perf_counter() - start
+    print(f"Planned single-pass insert: {new_s:.3f}s")
+
+    start = time.perf_counter()
+    old_df = _legacy_insert_variants(df.copy(), row_plan, set_temporal=True, temporal_value="1950-1959")
+    old_s = time.perf_counter() - start
+    print(f"Legacy per-variant concat:  {old_s:.3f}s ({old_s / new_s:.0f}x slower)")
+
+    same = new_df.astype(str).equals(old_df.astype(str))
+    print("✅ Outputs match." if same else "❌ Outputs differ!")
+    return same
+
+
+# -----------------------------
+# IMAGE ADJUSTMENTS
+# -----------------------------
+ADJUST_METHODS = ("pil", "lut+median", "lut+separable")
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _adjust_probe(megapixels: float, method: str):
+    """Clean one synthetic photo with one method and report time and memory as JSON (child process)."""
+    from PIL import Image, ImageEnhance, ImageFilter
+    from utils.image_adjust import apply_adjustments, get_median_filter_size
+
+    width = int((megapixels * 1e6 * 1.5) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    # Noisy grey scan, generated band by band so set-up doesn't raise the memory baseline
+    img = Image.merge("RGB", [Image.effect_noise((width, height), sigma) for sigma in (30, 35, 40)])
+    baseline = _peak_rss_mb()
+
+    start = time.perf_counter()
+    if method == "pil":
+        out = ImageEnhance.Brightness(img).enhance(1.1)
+        out = ImageEnhance.Contrast(out).enhance(1.1)
+        out = out.filter(ImageFilter.MedianFilter(size=get_median_filter_size(0.3)))
+    else:
+        out = apply_adjustments(img, 1.1, 1.1, 0.3, denoise_method=method.split("+")[1])
+    seconds = time.perf_counter() - start
+
+    peak = _peak_rss_mb()
+    print(json.dumps({
+        "seconds": seconds,
+        "extra_mb": peak - baseline if peak is not None else None,
+        "size": [out.width, out.height],
+    }))
+
+
+def run_adjust_benchmark(megapixels=(10, 40, 100)) -> bool:
+    """Time the old ImageEnhance/MedianFilter chain against the LUT engine, each in a fresh process."""
+    ok = True
+    for mp in megapixels:
+        print(f"--- {mp} MP ---")
+        baseline_s = None
+        for method in ADJUST_METHODS:
+            proc = subprocess.run(
+                [sys.executable, "-m", "scripts.benchmarks", "_adjust-probe", str(mp), method],
+                cwd=APP_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                print(f"❌ {method} failed:\n{proc.stderr.strip()}")
+                ok = False
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            baseline_s = baseline_s or result["seconds"]
+            extra = f", +{result['extra_mb']:.0f} MB peak" if result["extra_mb"] is not None else ""
+            print(f"{method:>14}: {result['seconds']:.2f}s ({baseline_s / result['seconds']:.1f}x){extra}")
+    return ok
+
+
+# -----------------------------
+# CSV LOADING
+# -----------------------------
+def run_csv_load_benchmark(files: int = 8, rows: int = 100_000, columns: int = 20) -> bool:
+    """Time loading a directory of synthetic CSVs: plain read_csv, first cached load, unchanged reload."""
+    import tempfile
+    import pandas as pd
+    from utils.csv_loader import load_csvs_from_dir
+
+    def timed_load(data_dir, **kwargs):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            datasets = load_csvs_from_dir(data_dir, **kwargs)
+        return time.perf_counter() - start, datasets
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, cache_dir = Path(tmp) / "data", Path(tmp) / "cache"
+        data_dir.mkdir()
+        df = pd.DataFrame({
+            "ID": [f"ABC{i:06d}" for i in range(rows)],
+            "Title": [f"scan_{i}.jpg" if i % 3 else None for i in range(rows)],
+            "Description": [f"Photograph {i} of the collection, digitised" for i in range(rows)],
+            "Temporal Coverage": [f"{1900 + i % 100 // 10 * 10}-{1909 + i % 100 // 10 * 10}" for i in range(rows)],
+            **{f"dcterms:field{c}": [f"value {c} {i % 50}" for i in range(rows)] for c in range(columns - 4)},
+        })
+        for f in range(files):
+            df.to_csv(data_dir / f"dataset_{f}.csv", index=False)
+        print(f"{files} CSVs x {rows} rows x {columns} columns")
+
+        plain_s, plain = timed_load(data_dir, use_cache=False, workers=1)
+        print(f"read_csv, one at a time:   {plain_s:.2f}s")
+        parallel_s, _ = timed_load(data_dir, use_cache=False)
+        print(f"read_csv, thread pool:     {parallel_s:.2f}s")
+        cold_s, _ = timed_load(data_dir, cache_dir=cache_dir)
+        print(f"first load (fills cache):  {cold_s:.2f}s")
+        warm_s, warm = timed_load(data_dir, cache_dir=cache_dir)
+        print(f"unchanged reload (cached): {warm_s:.2f}s ({plain_s / warm_s:.1f}x faster)")
+
+    same = all(plain[name].equals(warm[name]) for name in plain)
+    print("✅ Cached DataFrames match read_csv." if same else "❌ Cached DataFrames differ!")
+    return same
+
+
+# -----------------------------
+# IDENTIFIER POOL
+# -----------------------------
+def _legacy_build_pool(datasets):
+    """The original full rescan: every row of every dataset, on every rebuild."""
+    pool = {}
+    for name, df in datasets.items():
+        id_col = next((col for col in ["ID", "dcextended:identifier"] if col in df.columns), None)
+        if id_col is None:
+            pool[name] = []
+            continue
+        df_valid = df[df[id_col].notna()]
+        other_cols = [col for col in df_valid.columns if col not in {id_col, "file[mediasource]"}]
+        pool[name] = df_valid.loc[df_valid[other_cols].isna().all(axis=1), id_col].astype(str).tolist()
+    return pool
+
+
+def run_pool_rebuild_benchmark(files: int = 8, rows: int = 100_000, columns: int = 20) -> bool:
+    """Time identifier-pool rebuilds: first build, nothing changed, one row edited in one CSV."""
+    import tempfile
+    import pandas as pd
+    from utils.csv_loader import load_csvs_from_dir
+    from utils.identifiers import IdentifierPool
+
+    def timed_rebuild(data_dir, pool_file, cache_dir):
+        with contextlib.redirect_stdout(io.StringIO()):
+            datasets = load_csvs_from_dir(data_dir, cache_dir=cache_dir)
+            start = time.perf_counter()
+            pool = IdentifierPool(datasets, rebuild=True, pool_file=pool_file)
+        return time.perf_counter() - start, datasets, {name: list(ids) for name, ids in pool.pool.items()}
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, cache_dir, pool_file = Path(tmp) / "data", Path(tmp) / "cache", Path(tmp) / "pool.json"
+        data_dir.mkdir()
+        df = pd.DataFrame({
+            "ID": [f"ABC{i:06d}" for i in range(rows)],
+            "Title": [f"scan_{i}.jpg" if i % 4 else None for i in range(rows)],
+            **{f"dcterms:field{c}": [f"value {c}" if i % 4 else None for i in range(rows)] for c in range(columns - 2)},
+        })
+        for f in range(files):
+            df.to_csv(data_dir / f"dataset_{f}.csv", index=False)
+        print(f"{files} CSVs x {rows} rows x {columns} columns")
+
+        for label, edit in (("first build", None), ("nothing changed", None), ("one row edited", 0)):
+            if edit is not None:
+                edited = df.copy()
+                edited.loc[edit, "Title"] = "scan_edited.jpg"
+                edited.to_csv(data_dir / "dataset_0.csv", index=False)
+            seconds, datasets, pool = timed_rebuild(data_dir, pool_file, cache_dir)
+            start = time.perf_counter()
+            legacy = _legacy_build_pool(datasets)
+            legacy_s = time.perf_counter() - start
+            same = pool == legacy
+            ok &= same
+            print(f"{label:>16}: {seconds:.2f}s (full rescan {legacy_s:.2f}s){'' if same else '  ❌ pools differ!'}")
+
+    print("✅ Incremental pools match a full rescan." if ok else "❌ Incremental pools differ!")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metadata Creator benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    startup = sub.add_parser("startup", help="Time GUI import and first frame, fail if heavy modules leak in")
+    startup.add_argument("--runs", type=int, default=3, help="Number of fresh launches to time")
+    startup.add_argument("--budget", type=float, default=1.0, help="Maximum seconds to first frame")
+
+    sub.add_parser("_startup-probe", help=argparse.SUPPRESS)
+
+    variants = sub.add_parser("variants", help="Compare old and new variant row insertion")
+    variants.add_argument("--rows", type=int, default=50_000, help="Rows in the synthetic CSV")
+    variants.add_argument("--variant-ratio", type=float, default=0.2, help="Share of rows that get a variant")
+
+    adjust = sub.add_parser("adjust", help="Compare the PIL cleaning chain with the LUT engine")
+    adjust.add_argument("--megapixels", type=float, nargs="+", default=[10, 40, 100], help="Photo sizes to test")
+
+    adjust_probe = sub.add_parser("_adjust-probe", help=argparse.SUPPRESS)
+    adjust_probe.add_argument("megapixels", type=float)
+    adjust_probe.add_argument("method", choices=ADJUST_METHODS)
+
+    csv_load = sub.add_parser("csv-load", help="Compare plain CSV parsing with the parsed-dataset cache")
+    csv_load.add_argument("--files", type=int, default=8, help="Number of CSVs")
+    csv_load.add_argument("--rows", type=int, default=100_000, help="Rows per CSV")
+    csv_load.add_argument("--columns", type=int, default=20, help="Columns per CSV")
+
+    pool_rebuild = sub.add_parser("pool-rebuild", help="Compare full and incremental identifier-pool rebuilds")
+    pool_rebuild.add_argument("--files", type=int, default=8, help="Number of CSVs")
+    pool_rebuild.add_argument("--rows", type=int, default=100_000, help="Rows per CSV")
+    pool_rebuild.add_argument("--columns", type=int, default=20, help="Columns per CSV")
+
+    args = parser.parse_args()
+
+    if args.command == "_startup-probe":
+        _startup_probe()
+    elif args.command == "startup":
+        sys.exit(0 if run_startup_benchmark(runs=args.runs, budget=args.budget) else 1)
+    elif args.command == "variants":
+        sys.exit(0 if run_variant_benchmark(rows=args.rows, variant_ratio=args.variant_ratio) else 1)
+    elif args.command == "_adjust-probe":
+        _adjust_probe(args.megapixels, args.method)
+    elif args.command == "adjust":
+        sys.exit(0 if run_adjust_benchmark(megapixels=args.megapixels) else 1)
+    elif args.command == "csv-load":
+        sys.exit(0 if run_csv_load_benchmark(files=args.files, rows=args.rows, columns=args.columns) else 1)
+    elif args.command == "pool-rebuild":
+        sys.exit(0 if run_pool_rebuild_benchmark(files=args.files, rows=args.rows, columns=args.columns) else 1)
@@ -1,9 +1,12 @@
+from itertools import islice
 from pathlib import Path
 from tkinter import messagebox, simpledialog
 from utils.paths import DATA_DIR, DATA_TEST_DIR
 from utils.csv_loader import load_csvs_from_dir
+from utils.catalog import open_catalog
 from utils.variable_namer import assign_variables
 from utils.identifiers import IdentifierPool
+from utils.record_duplicates import find_duplicate_records, format_record_duplicate_report
 
 
 def run_load_and_inspect(test_mode: bool = False, gui_mode: bool = False):
@@ -13,8 +16,14 @@ def run_load_and_inspect(test_mode: bool = False, gui_mode: bool = False):
     data_dir = DATA_TEST_DIR if test_mode else DATA_DIR
     print(f"Using data folder: {data_dir}")
 
-    # --- Load CSVs ---
-    datasets = load_csvs_from_dir(data_dir)
+    # --- Load CSVs (inspection never writes them back, so compact dtypes are safe) ---
+    # With the SQLite catalog enabled the CSVs may be out of date, so read the catalog instead
+    catalog = open_catalog(test_mode)
+    if catalog is not None:
+        with catalog:
+            datasets = catalog.load_datasets()
+    else:
+        datasets = load_csvs_from_dir(data_dir, compact=True)
     if not datasets:
         msg = f"No CSV files found in {data_dir}"
         print(msg)
@@ -32,6 +41,9 @@ def run_load_and_inspect(test_mode: bool = False, gui_mode: bool = False):
         summary_lines.append(f"{var_name}: {len(df)} rows, {len(cols)} columns")
         summary_lines.append(f"  Columns: {cols[:5]}{'...' if len(cols) > 5 else ''}")
 
+    summary_lines.append("--- Duplicate Records ---")
+    summary_lines.append(format_record_duplicate_report(find_duplicate_records(assigned_variables)))
+
     summary_text = "\n".join(summary_lines)
     print(summary_text)
     if gui_mode:
@@ -50,7 +62,7 @@ def run_load_and_inspect(test_mode: bool = False, gui_mode: bool = False):
     pool_lines = ["--- Available ID Pools ---"]
     for csv_name, ids in id_pool.pool.items():
         pool_lines.append(f"{csv_name}: {len(ids)} available IDs")
-        pool_lines.append(f"  {ids[:10]}{'...' if len(ids) > 10 else ''}")
+        pool_lines.append(f"  {list(islice(ids, 10))}{'...' if len(ids) > 10 else ''}")
 
     pool_text = "\n".join(pool_lines)
     print(pool_text)
@@ -1,6 +1,6 @@
 from pathlib import Path
 from tkinter import messagebox, simpledialog, Toplevel, Label, Button, Frame, Button
-from PIL import Image, ImageEnhance, ImageTk, ImageFilter
+from PIL import Image, ImageTk
 from utils.paths import (
     DATA_DIR,
     DATA_TEST_DIR,
@@ -10,20 +10,116 @@ from utils.paths import (
     PHOTOS_TEST_RENAMED_DIR,
 )
 from utils.csv_loader import load_csvs_from_dir
+from utils.catalog import open_catalog
 from utils.variable_namer import assign_variables
 from utils.identifiers import IdentifierPool
-from utils.photo_variant_handler import group_and_rename_variants
+from utils.photo_variant_handler import group_and_rename_variants, group_photos, recover_interrupted_batch
+from utils.perceptual_hash import find_near_duplicates, get_hash_index
+from utils.content_hash import ContentHashCache, find_exact_duplicates, get_hash_cache_path
+from utils.rename_engine import RenameError, RenameJournal
+from utils.photo_index import get_photo_index
+from utils.thumbnail_cache import get_thumbnail_cache
+from utils.edit_recipes import NEUTRAL_RECIPE, get_recipe_store, is_neutral, photo_id, render_preview
+from utils.batch_clean import DEFAULT_SETTINGS, run_batch_clean
+from utils.image_adjust import DENOISE_METHODS
+import argparse
 import json
 import pandas as pd
 import threading
 
+RENAME_JOURNAL_FILE = "rename_journal.jsonl"
+PREVIEW_SIZE = (400, 400)
+
+# -----------------------------
+# DUPLICATE GUARD
+# -----------------------------
+def _confirm_skip(title: str, summary: str, lines: list[str], gui_mode: bool, dry_run: bool = False) -> bool:
+    """Show a duplicate report and ask whether to leave those photos out (a dry run only reports them)."""
+    report = "\n".join(lines[:20]) + (f"\n... and {len(lines) - 20} more" if len(lines) > 20 else "")
+    print(f"{title}:\n" + "\n".join(lines))
+    if dry_run:
+        print(f"Dry run: {summary.lower()}; they stay in the plan, a real run will ask whether to skip them.")
+        return False
+
+    prompt = f"{summary}:\n{report}\n\nSkip them? They stay in the originals folder."
+    if gui_mode:
+        return messagebox.askyesno(title, prompt)
+    return input(f"{prompt} (y/n): ").strip().lower() == "y"
+
+
+def skip_exact_duplicates(photo_files, renamed_dir, test_mode: bool = False, gui_mode: bool = False,
+                          dry_run: bool = False):
+    """
+    Find originals that are byte-identical to a photo already renamed (or an earlier original
+    in this batch) and offer to leave them out. Only files sharing a size are ever hashed.
+    A dry run reports them without asking and doesn't save the hash cache.
+    """
+    renamed = get_photo_index(renamed_dir).paths()
+    cache = ContentHashCache(get_hash_cache_path(test_mode))
+    groups = find_exact_duplicates(renamed + list(photo_files), cache)
+    if not dry_run:
+        cache.save()
+
+    originals = set(photo_files)
+    pairs = [(path, group[0]) for group in groups for path in group[1:] if path in originals]
+    if not pairs:
+        return photo_files
+
+    lines = [f"{dup.name} = {match.name}" for dup, match in pairs]
+    if not _confirm_skip("Exact Duplicates", f"{len(pairs)} photos are identical copies", lines, gui_mode,
+                         dry_run=dry_run):
+        return photo_files
+    duplicates = {dup for dup, _ in pairs}
+    return [p for p in photo_files if p not in duplicates]
+
+
+def skip_near_duplicates(photo_files, renamed_dir, test_mode: bool = False, gui_mode: bool = False,
+                         dry_run: bool = False):
+    """
+    Find originals that look like a photo already renamed (or an earlier original in this batch)
+    and offer to leave them out, so duplicates don't use up IDs. Variants of one photo never count.
+    A dry run reports them without asking and doesn't save the hash index.
+    """
+    index = get_hash_index(test_mode)
+    base_of = {path: base for base, group in group_photos(photo_files).items() for _, path in group}
+    pairs = find_near_duplicates(
+        photo_files,
+        get_photo_index(renamed_dir).paths(),
+        index,
+        same_group=lambda a, b: a in base_of and base_of.get(a) == base_of.get(b),
+    )
+    if not dry_run:
+        index.save()
+    if not pairs:
+        return photo_files
+
+    lines = [f"{dup.name} ≈ {match.name} (distance {distance})" for dup, match, distance in pairs]
+    if not _confirm_skip("Possible Duplicates", f"{len(pairs)} photos look like duplicates", lines, gui_mode,
+                         dry_run=dry_run):
+        return photo_files
+    duplicates = {dup for dup, _, _ in pairs}
+    return [p for p in photo_files if p not in duplicates]
+
+
 # -----------------------------
 # PHOTO RENAMER
 # -----------------------------
-def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False):
+def _report_rename_error(error: Exception, journal: RenameJournal, gui_mode: bool):
+    """A batch failed part-way; its journal stays on disk so the next run can resume or roll it back."""
+    msg = f"Renaming stopped: {error}"
+    if journal.exists():
+        msg += (f"\n\nThe batch is recorded in {journal.path}. Fix the problem and run the renamer "
+                f"again: it will offer to resume the batch or roll it back.")
+    print(f"❌ {msg}")
+    if gui_mode:
+        messagebox.showerror("Rename Failed", msg)
+
+
+def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False, dry_run: bool = False):
     """
     Rename photo files using IDs from CSVs (CLI or GUI) and save a pool for AI captioning.
     Properly respects test_mode for all paths and pool usage.
+    With dry_run=True the planned renames are reported and nothing is moved or saved.
     """
     # --- Paths ---
     if test_mode:
@@ -39,10 +135,15 @@ def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False):
         pool_file = DATA_DIR / "available_ids.json"
         ai_pool_file = DATA_DIR / "ai_pool.json"
 
-    renamed_dir.mkdir(parents=True, exist_ok=True)
+    if not dry_run:
+        renamed_dir.mkdir(parents=True, exist_ok=True)
 
-    # --- Load CSV data ---
-    datasets = load_csvs_from_dir(data_dir)
+    # --- Load CSV data (from the SQLite catalog when it is enabled) ---
+    catalog = open_catalog(test_mode)
+    if catalog is not None:
+        datasets = catalog.load_datasets()
+    else:
+        datasets = load_csvs_from_dir(data_dir, use_cache=not dry_run)  # a dry run leaves the parsed-CSV cache alone
     if not datasets:
         msg = f"No CSV files found in {data_dir}"
         print(msg)
@@ -53,10 +154,28 @@ def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False):
     # --- Assign variables from CSVs ---
     assigned_variables = assign_variables(datasets)
 
-    # --- Initialize ID pool ---
-    id_pool = IdentifierPool(assigned_variables, test_mode=test_mode)
+    # --- Initialize ID pool (a dry run builds it in memory and saves nothing) ---
+    id_pool = IdentifierPool(assigned_variables, test_mode=test_mode, read_only=dry_run)
     id_pool.pool_file = pool_file
 
+    # --- Finish or undo a batch that was interrupted part-way ---
+    rename_journal = RenameJournal(data_dir / RENAME_JOURNAL_FILE)
+    if rename_journal.exists() and not dry_run:
+        prompt = "A previous rename batch was interrupted. Resume it? (No rolls it back)"
+        if gui_mode:
+            resume = messagebox.askyesno("Interrupted Rename", prompt)
+        else:
+            resume = input(f"{prompt} (y/n): ").strip().lower() == "y"
+        try:
+            recovered = recover_interrupted_batch(rename_journal, id_pool, resume=resume, catalog=catalog)
+        except RenameError as e:
+            _report_rename_error(e, rename_journal, gui_mode)
+            return
+        if recovered:
+            # The dataset changed, so reload before planning the next batch
+            datasets = catalog.load_datasets() if catalog is not None else load_csvs_from_dir(data_dir)
+            assigned_variables = assign_variables(datasets)
+
     # --- Choose pool ---
     available_pools = list(id_pool.pool.keys())
     if not available_pools:
@@ -134,22 +253,60 @@ def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False):
             messagebox.showwarning("No Photos Found", msg)
         return
 
-    df, total_renamed = group_and_rename_variants(
-        photo_files=photo_files,
-        id_pool=id_pool,
-        pool_choice=pool_choice,
-        df=df,
-        renamed_dir=renamed_dir,
-        set_temporal=set_temporal,
-        temporal_value=temporal_value,
-    )
+    # --- Leave out duplicates before any IDs are reserved ---
+    photo_files = skip_exact_duplicates(photo_files, renamed_dir, test_mode=test_mode, gui_mode=gui_mode,
+                                        dry_run=dry_run)
+    photo_files = skip_near_duplicates(photo_files, renamed_dir, test_mode=test_mode, gui_mode=gui_mode,
+                                       dry_run=dry_run)
+    if not photo_files:
+        print("Nothing left to rename.")
+        return
 
-    # --- Save CSV ---
     csv_file_path = data_dir / f"{pool_choice}.csv"
-    df.to_csv(csv_file_path, index=False)
+    rename_journal.csv_path = csv_file_path
+
+    try:
+        df, total_renamed = group_and_rename_variants(
+            photo_files=photo_files,
+            id_pool=id_pool,
+            pool_choice=pool_choice,
+            df=df,
+            renamed_dir=renamed_dir,
+            set_temporal=set_temporal,
+            temporal_value=temporal_value,
+            journal=rename_journal,
+            dry_run=dry_run,
+        )
+    except RenameError as e:
+        _report_rename_error(e, rename_journal, gui_mode)
+        return
+
+    if dry_run:
+        summary_msg = f"Dry run: {total_renamed} photos would be renamed into {renamed_dir}. Nothing was changed."
+        print(summary_msg)
+        if gui_mode:
+            messagebox.showinfo("Dry Run", summary_msg)
+        return
+
+    # --- The moves carried their hash entries over; drop entries of files that are gone ---
+    hash_index = get_hash_index(test_mode)
+    hash_index.prune()
+    hash_index.save()
+
+    # --- Save CSV ---
+    if catalog is not None:
+        catalog.import_dataframe(pool_choice, df, source_path=str(csv_file_path))
+        print(f"Updated dataset '{pool_choice}' saved to catalog")
+    else:
+        df.to_csv(csv_file_path, index=False)
+
+    # --- Fold the pool journal into its snapshot, then mark the batch complete ---
+    id_pool.close()
+    rename_journal.commit()
 
     # --- Save AI Pool ---
-    ai_ids = [str(f) for f in df['ID'] if pd.notna(f) and list(renamed_dir.glob(f"{f}.*"))]
+    renamed_index = get_photo_index(renamed_dir)
+    ai_ids = [str(f) for f in df['ID'] if pd.notna(f) and str(f) in renamed_index]
     with open(ai_pool_file, 'w') as f:
         json.dump(ai_ids, f, indent=2)
 
@@ -168,10 +325,14 @@ def run_photo_renamer(test_mode: bool = False, gui_mode: bool = False):
 # -----------------------------
 # PHOTO CLEANING
 # -----------------------------
-def clean_photos(test_mode: bool = False, gui_mode: bool = False):
+def clean_photos(test_mode: bool = False, gui_mode: bool = False,
+                 denoise_method: str = DEFAULT_SETTINGS["denoise_method"]):
     """
-    Apply cleaning operations to photos (brightness/contrast/denoise/rotation) in place.
-    Shows old vs cleaned images for user choice with streamlined controls.
+    Choose cleaning settings (brightness/contrast/denoise/rotation) for each photo.
+    Shows old vs cleaned images for user choice with streamlined controls. The choice is
+    saved as a recipe; the photos themselves are never rewritten.
+    denoise_method: filter for headless recipes and for photos that have no recipe yet
+    ("separable" is much faster on large scans, "median" is exact).
     """
     target_dir = PHOTOS_TEST_RENAMED_DIR if test_mode else PHOTOS_RENAMED_DIR
     photo_files = sorted(target_dir.glob("*.*"))
@@ -183,123 +344,157 @@ def clean_photos(test_mode: bool = False, gui_mode: bool = False):
             messagebox.showwarning("No Photos Found", msg)
         return
 
-    def get_median_filter_size(denoise_factor: float) -> int:
-        """Map denoise factor (0-1) to odd integer size for MedianFilter (1–9)."""
-        size = max(1, min(9, int(denoise_factor * 9) | 1))  # Ensure odd number
-        return size
+    store = get_recipe_store(test_mode)
+    if not gui_mode:
+        # Non-GUI automatic cleaning: default recipes for photos that don't have one yet
+        run_batch_clean(photo_files, settings={"denoise_method": denoise_method}, test_mode=test_mode)
+        print(f"Photo cleaning recipes saved in {store.recipes_dir}; originals left untouched")
+        return
 
     for photo_path in photo_files:
-        img = Image.open(photo_path).convert("RGB")
+        # Start from the photo's saved recipe, if it has one
+        image_id = photo_id(photo_path)
+        saved = store.get(image_id)
+        recipe = {**NEUTRAL_RECIPE, **(saved or {})}
+        brightness = recipe["brightness"]
+        contrast = recipe["contrast"]
+        denoise = recipe["denoise"]
+        rotation = recipe["rotation"]
+        method = recipe.get("denoise_method", "median") if saved else denoise_method  # saved recipes omit "median"
+
+        window = Toplevel()
+        window.title(f"Clean Photo: {photo_path.name}")
+        window.configure(bg="white")
+
+        # --- Labels for old vs preview ---
+        Label(window, text="Original", font=("Arial", 12, "bold"), bg="white").grid(row=0, column=0)
+        Label(window, text="Preview", font=("Arial", 12, "bold"), bg="white").grid(row=0, column=1)
+
+        # The preview works on a cached low-resolution proxy; the full image is only
+        # decoded when a cleaned derivative is requested
+        proxy = get_thumbnail_cache().get(photo_path, PREVIEW_SIZE)
+        with Image.open(photo_path) as full:
+            proxy_scale = proxy.width / full.width
+
+        orig_imgtk = ImageTk.PhotoImage(proxy)
+        old_canvas = Label(window, image=orig_imgtk)
+        old_canvas.image = orig_imgtk
+        old_canvas.grid(row=1, column=0, padx=10, pady=10)
+
+        # One PhotoImage for the whole session; each update pastes into it
+        preview_imgtk = ImageTk.PhotoImage("RGB", PREVIEW_SIZE)
+        clean_canvas = Label(window, image=preview_imgtk)
+        clean_canvas.image = preview_imgtk
+        clean_canvas.grid(row=1, column=1, padx=10, pady=10)
+
+        # --- Update preview function ---
+        def update_preview():
+            preview_img = render_preview(proxy, current_recipe(), scale=proxy_scale)
+            preview_img.thumbnail(PREVIEW_SIZE)  # a quarter turn of a landscape proxy is taller than the box
+            frame = Image.new("RGB", PREVIEW_SIZE, "white")
+            frame.paste(preview_img, ((PREVIEW_SIZE[0] - preview_img.width) // 2,
+                                      (PREVIEW_SIZE[1] - preview_img.height) // 2))
+            preview_imgtk.paste(frame)
+
+        # --- Helper to create up/down control for a parameter ---
+        def create_control(name, value_getter, value_setter, row):
+            frame = Frame(window, bg="white")
+            frame.grid(row=row, column=0, columnspan=2, pady=2)
+            Label(frame, text=f"{name}: ", font=("Arial", 10), bg="white").pack(side="left")
+            value_label = Label(frame, text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}", width=5, bg="white")
+            value_label.pack(side="left", padx=2)
+
+            def up():
+                value_setter(1)
+                value_label.config(text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}")
+                update_preview()
+
+            def down():
+                value_setter(-1)
+                value_label.config(text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}")
+                update_preview()
+
+            Button(frame, text="▲", command=up, width=2).pack(side="left")
+            Button(frame, text="▼", command=down, width=2).pack(side="left")
+
+        # --- Define setters and getters ---
+        create_control("Brightness",
+                       lambda: brightness,
+                       lambda d: nonlocal_set('brightness', d * 0.1),
+                       row=2)
+        create_control("Contrast",
+                       lambda: contrast,
+                       lambda d: nonlocal_set('contrast', d * 0.1),
+                       row=3)
+        create_control("Denoise",
+                       lambda: denoise,
+                       lambda d: nonlocal_set('denoise', d * 0.1),
+                       row=4)
+        create_control("Rotation",
+                       lambda: rotation,
+                       lambda d: nonlocal_set('rotation', d * 90),
+                       row=5)
+
+        # --- Denoise filter: exact median or the much faster separable approximation ---
+        method_frame = Frame(window, bg="white")
+        method_frame.grid(row=6, column=0, columnspan=2, pady=2)
+        Label(method_frame, text="Denoise filter: ", font=("Arial", 10), bg="white").pack(side="left")
+        method_label = Label(method_frame, text=method, width=9, bg="white")
+        method_label.pack(side="left", padx=2)
+
+        def switch_method():
+            nonlocal method
+            method = DENOISE_METHODS[(DENOISE_METHODS.index(method) + 1) % len(DENOISE_METHODS)]
+            method_label.config(text=method)
+            update_preview()
 
-        # Default adjustment values
-        brightness = 1.0
-        contrast = 1.0
-        denoise = 0.0
-        rotation = 0
-        preview_img = img.copy()  # nonlocal reference
+        Button(method_frame, text="⇄", command=switch_method, width=2).pack(side="left")
+
+        # --- Buttons for keeping images ---
+        Button(window, text="Keep Original", bg="lightgray", command=lambda: keep_original()).grid(row=7, column=0, pady=10, sticky="ew")
+        Button(window, text="Keep Cleaned", bg="lightgreen", command=lambda: save_and_close()).grid(row=7, column=1, pady=10, sticky="ew")
+
+        # Helper functions for nonlocal variables
+        def nonlocal_set(name, delta):
+            nonlocal brightness, contrast, denoise, rotation
+            if name == "brightness":
+                brightness = round(max(0.1, brightness + delta), 2)
+            elif name == "contrast":
+                contrast = round(max(0.1, contrast + delta), 2)
+            elif name == "denoise":
+                denoise = round(min(max(0.0, denoise + delta), 1.0), 2)
+            elif name == "rotation":
+                rotation = (rotation + delta) % 360
+
+        def current_recipe():
+            # Any other saved settings (e.g. max_size from a batch run) are kept
+            return {**recipe, "brightness": brightness, "contrast": contrast,
+                    "denoise": denoise, "rotation": rotation, "denoise_method": method}
+
+        def keep_original():
+            store.delete(image_id)
+            window.destroy()
+
+        def save_and_close():
+            cleaned = current_recipe()
+            if is_neutral(cleaned):
+                store.delete(image_id)
+            else:
+                store.set(image_id, cleaned)
+            window.destroy()
+
+        update_preview()
+        window.wait_window()
+
+    msg = f"Photo cleaning recipes saved in {store.recipes_dir}; originals left untouched"
+    print(msg)
+    messagebox.showinfo("Cleaning Complete", msg)
 
-        if gui_mode:
-            window = Toplevel()
-            window.title(f"Clean Photo: {photo_path.name}")
-            window.configure(bg="white")
-
-            # --- Labels for old vs preview ---
-            Label(window, text="Original", font=("Arial", 12, "bold"), bg="white").grid(row=0, column=0)
-            Label(window, text="Preview", font=("Arial", 12, "bold"), bg="white").grid(row=0, column=1)
-
-            orig_imgtk = ImageTk.PhotoImage(img.resize((400, 400)))
-            old_canvas = Label(window, image=orig_imgtk)
-            old_canvas.image = orig_imgtk
-            old_canvas.grid(row=1, column=0, padx=10, pady=10)
-
-            clean_canvas = Label(window)
-            clean_canvas.grid(row=1, column=1, padx=10, pady=10)
-
-            # --- Update preview function ---
-            def update_preview():
-                nonlocal preview_img
-                preview_img = img.copy()
-                preview_img = ImageEnhance.Brightness(preview_img).enhance(brightness)
-                preview_img = ImageEnhance.Contrast(preview_img).enhance(contrast)
-                if denoise > 0:
-                    size = get_median_filter_size(denoise)
-                    preview_img = preview_img.filter(ImageFilter.MedianFilter(size=size))
-                if rotation != 0:
-                    preview_img = preview_img.rotate(rotation, expand=True)
-                preview_imgtk = ImageTk.PhotoImage(preview_img.resize((400, 400)))
-                clean_canvas.configure(image=preview_imgtk)
-                clean_canvas.image = preview_imgtk
-
-            # --- Helper to create up/down control for a parameter ---
-            def create_control(name, value_getter, value_setter, row):
-                frame = Frame(window, bg="white")
-                frame.grid(row=row, column=0, columnspan=2, pady=2)
-                Label(frame, text=f"{name}: ", font=("Arial", 10), bg="white").pack(side="left")
-                value_label = Label(frame, text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}", width=5, bg="white")
-                value_label.pack(side="left", padx=2)
-
-                def up():
-                    value_setter(1)
-                    value_label.config(text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}")
-                    update_preview()
-
-                def down():
-                    value_setter(-1)
-                    value_label.config(text=f"{value_getter():.2f}" if name != "Denoise" else f"{value_getter():.1f}")
-                    update_preview()
-
-                Button(frame, text="▲", command=up, width=2).pack(side="left")
-                Button(frame, text="▼", command=down, width=2).pack(side="left")
-
-            # --- Define setters and getters ---
-            create_control("Brightness",
-                           lambda: brightness,
-                           lambda d: nonlocal_set('brightness', d * 0.1),
-                           row=2)
-            create_control("Contrast",
-                           lambda: contrast,
-                           lambda d: nonlocal_set('contrast', d * 0.1),
-                           row=3)
-            create_control("Denoise",
-                           lambda: denoise,
-                           lambda d: nonlocal_set('denoise', d * 0.1),
-                           row=4)
-            create_control("Rotation",
-                           lambda: rotation,
-                           lambda d: nonlocal_set('rotation', d * 90),
-                           row=5)
-
-            # --- Buttons for keeping images ---
-            Button(window, text="Keep Original", bg="lightgray", command=lambda: window.destroy()).grid(row=6, column=0, pady=10, sticky="ew")
-            Button(window, text="Keep Cleaned", bg="lightgreen", command=lambda: save_and_close()).grid(row=6, column=1, pady=10, sticky="ew")
-
-            # Helper functions for nonlocal variables
-            def nonlocal_set(name, delta):
-                nonlocal brightness, contrast, denoise, rotation
-                if name == "brightness":
-                    brightness = max(0.1, brightness + delta)
-                elif name == "contrast":
-                    contrast = max(0.1, contrast + delta)
-                elif name == "denoise":
-                    denoise = min(max(0.0, denoise + delta), 1.0)
-                elif name == "rotation":
-                    rotation = (rotation + delta) % 360
-
-            def save_and_close():
-                preview_img.save(photo_path)
-                window.destroy()
 
-            update_preview()
-            window.wait_window()
-        else:
-            # Non-GUI automatic cleaning
-            cleaned_img = ImageEnhance.Brightness(img).enhance(1.1)
-            cleaned_img = ImageEnhance.Contrast(cleaned_img).enhance(1.1)
-            cleaned_img = cleaned_img.filter(ImageFilter.MedianFilter(size=3))
-            cleaned_img.thumbnail((800, 800))
-            cleaned_img.save(photo_path)
-
-    msg = f"Photo cleaning complete in place for {target_dir}"
-    print(msg)
-    if gui_mode:
-        messagebox.showinfo("Cleaning Complete", msg)
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rename photos using IDs from the CSV pools")
+    parser.add_argument("--test", action="store_true", help="Use test directories and CSVs")
+    parser.add_argument("--dry-run", action="store_true", help="Report the planned renames without changing anything")
+    args = parser.parse_args()
+
+    run_photo_renamer(test_mode=args.test, dry_run=args.dry_run)
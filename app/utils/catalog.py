@@ -0,0 +1,404 @@
+# utils/catalog.py
+"""
+Optional SQLite catalog holding the datasets and identifier pools.
+
+Each dataset lives in its own table with an index on ID, so single-row edits are
+indexed updates instead of whole-CSV rewrites. CSVs stay the exchange format:
+import them into the catalog, work against it, export when done.
+
+The app only uses the catalog after it has been switched on with `enable`. From then
+on caption saves, review edits, new IDs and renames update the catalog rather than the
+CSVs; `disable` writes everything back to the CSVs and the pool file and switches it off.
+
+Run from the app/ folder:
+    python -m utils.catalog enable [--test]     (import, then let the app edit the catalog)
+    python -m utils.catalog disable [--test]    (export, then go back to editing the CSVs)
+    python -m utils.catalog import [--test]
+    python -m utils.catalog export [--test]
+"""
+import argparse
+import json
+import sqlite3
+import uuid
+from collections import deque
+from pathlib import Path
+import pandas as pd
+from utils.csv_writer import same_value
+from utils.paths import DATA_DIR, DATA_TEST_DIR
+
+CATALOG_FILE = "catalog.sqlite3"
+ID_COLUMN_CANDIDATES = ["ID", "dcextended:identifier"]
+
+
+def get_catalog_path(test_mode: bool = False) -> Path:
+    return (DATA_TEST_DIR if test_mode else DATA_DIR) / CATALOG_FILE
+
+
+def _quote(identifier: str) -> str:
+    """Quote a table/column name for SQL (CSV headers can contain anything)."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _table_for(name: str) -> str:
+    return _quote(f"dataset:{name}")
+
+
+def _to_db(value):
+    return None if pd.isna(value) else str(value)
+
+
+def _pool_version(pool_file: Path) -> str:
+    """Size and mtime of a pool snapshot and its journal, to tell whether the app changed them."""
+    parts = []
+    for path in (pool_file, pool_file.with_name(pool_file.name + ".journal")):
+        try:
+            stat = path.stat()
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+class MetadataCatalog:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS datasets ("
+                " name TEXT PRIMARY KEY, id_column TEXT, columns TEXT NOT NULL, source_path TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pools ("
+                " dataset TEXT NOT NULL, position INTEGER NOT NULL, id TEXT NOT NULL,"
+                " PRIMARY KEY (dataset, position))"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_setting(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_setting(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    def _touch(self, name: str):
+        """Give a dataset a new version (call inside the transaction that changes it)."""
+        self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                          (f"version:{name}", uuid.uuid4().hex))
+
+    def dataset_version(self, name: str) -> str:
+        """Token that changes whenever a dataset's rows or columns change (like a CSV's size and mtime)."""
+        version = self._get_setting(f"version:{name}")
+        if version is None:
+            with self.conn:
+                self._touch(name)
+            version = self._get_setting(f"version:{name}")
+        return version
+
+    @property
+    def enabled(self) -> bool:
+        """True if the app should edit the catalog instead of the CSVs."""
+        return self._get_setting("enabled") == "1"
+
+    def set_enabled(self, enabled: bool):
+        self._set_setting("enabled", "1" if enabled else "0")
+
+    # -----------------------------
+    # Datasets
+    # -----------------------------
+    def dataset_names(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("SELECT name FROM datasets ORDER BY name")]
+
+    def _dataset_info(self, name: str) -> tuple[str | None, list[str]]:
+        row = self.conn.execute("SELECT id_column, columns FROM datasets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"Dataset '{name}' is not in the catalog")
+        return row[0], json.loads(row[1])
+
+    def columns(self, name: str) -> list[str]:
+        return self._dataset_info(name)[1]
+
+    def import_dataframe(self, name: str, df: pd.DataFrame, source_path: str | None = None) -> list[str]:
+        """
+        Replace a dataset's table with the contents of df (row order is kept).
+        Returns the IDs used by more than one row; they are imported as they are, but
+        can't be edited by ID until the duplicates are fixed.
+        """
+        columns = [str(c) for c in df.columns]
+        id_column = next((c for c in ID_COLUMN_CANDIDATES if c in columns), None)
+
+        duplicates = []
+        if id_column:
+            ids = df[id_column].dropna().astype(str)
+            duplicates = sorted(ids[ids.duplicated()].unique())
+            if duplicates:
+                print(f"⚠ {len(duplicates)} IDs are used by more than one row in '{name}': "
+                      f"{', '.join(duplicates[:10])}{' ...' if len(duplicates) > 10 else ''}")
+
+        column_defs = ["_pos INTEGER NOT NULL"] + [f"{_quote(c)} TEXT" for c in columns]
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        insert_sql = (
+            f"INSERT INTO {_table_for(name)} (_pos, {', '.join(_quote(c) for c in columns)}) "
+            f"VALUES ({placeholders})"
+        )
+
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {_table_for(name)}")
+            self.conn.execute(f"CREATE TABLE {_table_for(name)} ({', '.join(column_defs)})")
+            self.conn.execute(f"CREATE INDEX {_quote(f'pos:{name}')} ON {_table_for(name)} (_pos)")
+            if id_column:
+                self.conn.execute(f"CREATE INDEX {_quote(f'id:{name}')} ON {_table_for(name)} ({_quote(id_column)})")
+            self.conn.executemany(
+                insert_sql,
+                ([pos, *map(_to_db, values)] for pos, values in enumerate(df.itertuples(index=False, name=None))),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO datasets (name, id_column, columns, source_path) VALUES (?, ?, ?, ?)",
+                (name, id_column, json.dumps(columns), source_path),
+            )
+            self._touch(name)
+        return duplicates
+
+    def import_csv(self, csv_path: Path, name: str | None = None) -> str:
+        """Import a CSV as a dataset named after its file stem (or name)."""
+        csv_path = Path(csv_path)
+        name = name or csv_path.stem
+        df = pd.read_csv(csv_path, dtype=str)
+        self.import_dataframe(name, df, source_path=str(csv_path))
+        print(f"Imported {csv_path.name} into catalog as '{name}' ({len(df)} rows)")
+        return name
+
+    def get_dataframe(self, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        """Read a dataset back in its original row order."""
+        _, all_columns = self._dataset_info(name)
+        columns = columns or all_columns
+        rows = self.conn.execute(
+            f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_table_for(name)} ORDER BY _pos"
+        ).fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def load_datasets(self) -> dict[str, pd.DataFrame]:
+        """
+        Every dataset as a DataFrame keyed by name, with its CSV path in df.attrs like load_csvs_from_dir
+        and its version in df.attrs["catalog_version"] (the CSV itself may be out of date).
+        """
+        datasets = {}
+        for name, source_path in self.conn.execute("SELECT name, source_path FROM datasets ORDER BY name").fetchall():
+            df = self.get_dataframe(name)
+            if source_path:
+                df.attrs["file_path"] = source_path
+            df.attrs["catalog_version"] = self.dataset_version(name)
+            datasets[name] = df
+            print(f"Loaded '{name}' from catalog ({len(df)} rows, {len(df.columns)} columns)")
+        return datasets
+
+    def duplicate_ids(self, name: str) -> list[str]:
+        """IDs used by more than one row of a dataset."""
+        id_column, _ = self._dataset_info(name)
+        if id_column is None:
+            return []
+        return [row[0] for row in self.conn.execute(
+            f"SELECT {_quote(id_column)} FROM {_table_for(name)} WHERE {_quote(id_column)} IS NOT NULL "
+            f"GROUP BY {_quote(id_column)} HAVING COUNT(*) > 1 ORDER BY 1"
+        )]
+
+    def export_csv(self, name: str, csv_path: Path | None = None) -> Path:
+        """Write a dataset to CSV (by default back to the file it was imported from)."""
+        if csv_path is None:
+            row = self.conn.execute("SELECT source_path FROM datasets WHERE name = ?", (name,)).fetchone()
+            if row is None or not row[0]:
+                raise ValueError(f"No CSV path known for dataset '{name}'")
+            csv_path = Path(row[0])
+        self.get_dataframe(name).to_csv(csv_path, index=False)
+        print(f"Exported '{name}' to {csv_path}")
+        return Path(csv_path)
+
+    def get_row(self, name: str, row_id: str) -> dict | None:
+        id_column, columns = self._dataset_info(name)
+        row = self.conn.execute(
+            f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_table_for(name)} WHERE {_quote(id_column)} = ?",
+            (row_id,),
+        ).fetchone()
+        return dict(zip(columns, row)) if row else None
+
+    def update_rows(self, name: str, updates: dict[str, dict]) -> int:
+        """Apply {id: {column: value}} edits in one transaction. Returns the number of rows changed."""
+        id_column, columns = self._dataset_info(name)
+        if id_column is None:
+            raise ValueError(f"Dataset '{name}' has no ID column")
+
+        changed = 0
+        with self.conn:
+            for row_id, values in updates.items():
+                unknown = set(values) - set(columns)
+                if unknown:
+                    raise KeyError(f"Unknown columns for '{name}': {', '.join(sorted(unknown))}")
+                assignments = ", ".join(f"{_quote(c)} = ?" for c in values)
+                cursor = self.conn.execute(
+                    f"UPDATE {_table_for(name)} SET {assignments} WHERE {_quote(id_column)} = ?",
+                    (*map(_to_db, values.values()), str(row_id)),
+                )
+                if cursor.rowcount > 1:
+                    # Raising inside the transaction rolls back every update in this call
+                    raise ValueError(f"ID '{row_id}' is used by {cursor.rowcount} rows in '{name}'; "
+                                     f"fix the duplicates before editing it")
+                changed += cursor.rowcount
+            if changed:
+                self._touch(name)
+        return changed
+
+    def update_row(self, name: str, row_id: str, values: dict) -> bool:
+        """Indexed single-row update by ID."""
+        return self.update_rows(name, {row_id: values}) > 0
+
+    def add_column(self, name: str, column: str):
+        """Add an empty column to a dataset (no-op if it exists)."""
+        id_column, columns = self._dataset_info(name)
+        if column in columns:
+            return
+        with self.conn:
+            self.conn.execute(f"ALTER TABLE {_table_for(name)} ADD COLUMN {_quote(column)} TEXT")
+            self.conn.execute("UPDATE datasets SET columns = ? WHERE name = ?", (json.dumps(columns + [column]), name))
+            self._touch(name)
+
+    def append_rows(self, name: str, rows: list[dict]) -> int:
+        """Add rows ({column: value}, missing columns left empty) after the last row. Returns how many."""
+        _, columns = self._dataset_info(name)
+        unknown = {c for row in rows for c in row} - set(columns)
+        if unknown:
+            raise KeyError(f"Unknown columns for '{name}': {', '.join(sorted(unknown))}")
+        with self.conn:
+            start = self.conn.execute(f"SELECT COALESCE(MAX(_pos) + 1, 0) FROM {_table_for(name)}").fetchone()[0]
+            self.conn.executemany(
+                f"INSERT INTO {_table_for(name)} (_pos, {', '.join(_quote(c) for c in columns)}) "
+                f"VALUES ({', '.join('?' for _ in range(len(columns) + 1))})",
+                ([start + i, *(_to_db(row.get(c)) for c in columns)] for i, row in enumerate(rows)),
+            )
+            self._touch(name)
+        return len(rows)
+
+    # -----------------------------
+    # Identifier pools
+    # -----------------------------
+    def save_pools(self, pools: dict):
+        """Replace all stored pools with {dataset: [ids]} (lists or deques)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM pools")
+            self.conn.executemany(
+                "INSERT INTO pools (dataset, position, id) VALUES (?, ?, ?)",
+                ((name, pos, identifier) for name, ids in pools.items() for pos, identifier in enumerate(ids)),
+            )
+
+    def load_pools(self) -> dict[str, deque]:
+        pools = {}
+        for name, identifier in self.conn.execute("SELECT dataset, id FROM pools ORDER BY dataset, position"):
+            pools.setdefault(name, deque()).append(identifier)
+        return pools
+
+    def import_pools(self, pool_file: Path):
+        """Copy the pool file (snapshot + journal) into the catalog."""
+        from utils.identifiers import load_pool_file
+
+        self.save_pools(load_pool_file(pool_file))
+        self._set_setting("pool_version", _pool_version(pool_file))
+
+    def export_pools(self, pool_file: Path):
+        """
+        Write the catalog's pools back to the pool file. If the app changed the pool file
+        since it was imported, the file is newer than the catalog: it is kept, and the
+        catalog's copy is refreshed from it instead.
+        """
+        from utils.identifiers import save_pool_file
+
+        if pool_file.exists() and _pool_version(pool_file) != self._get_setting("pool_version"):
+            print(f"⚠ {pool_file.name} changed since it was imported; keeping it and refreshing the catalog's copy")
+            self.import_pools(pool_file)
+            return
+        save_pool_file(pool_file, self.load_pools())
+        self._set_setting("pool_version", _pool_version(pool_file))
+        print(f"Exported ID pools to {pool_file}")
+
+
+# -----------------------------
+# APP BACKEND
+# -----------------------------
+class CatalogWriter:
+    def __init__(self, catalog: MetadataCatalog, name: str, df: pd.DataFrame):
+        """
+        Drop-in for DeferredCsvWriter when a dataset is edited in the catalog: every changed
+        cell is an indexed UPDATE of that row by ID, so there is nothing to flush.
+        """
+        self.catalog = catalog
+        self.name = name
+        self.df = df
+        self.is_dirty = False
+
+    def update(self, row: int, column: str, value) -> bool:
+        """Set one cell; returns False if the value didn't change."""
+        if same_value(self.df.at[row, column], value):
+            return False
+        self.catalog.update_row(self.name, str(self.df.at[row, "ID"]), {column: value})
+        self.df.at[row, column] = value
+        return True
+
+    def flush(self, wait: bool = True):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_catalog(test_mode: bool = False) -> MetadataCatalog | None:
+    """The catalog, if one exists and has been enabled for the app; otherwise None (use the CSVs)."""
+    db_path = get_catalog_path(test_mode)
+    if not db_path.exists():
+        return None
+    catalog = MetadataCatalog(db_path)
+    if not catalog.enabled:
+        catalog.close()
+        return None
+    return catalog
+
+
+if __name__ == "__main__":
+    from utils.identifiers import DEFAULT_POOL_FILE, TEST_POOL_FILE
+
+    parser = argparse.ArgumentParser(description="Import/export CSVs and ID pools to the SQLite catalog")
+    parser.add_argument("command", choices=["import", "export", "enable", "disable"])
+    parser.add_argument("--test", action="store_true", help="Use test directories and CSVs")
+    args = parser.parse_args()
+
+    data_dir = DATA_TEST_DIR if args.test else DATA_DIR
+    pool_file = TEST_POOL_FILE if args.test else DEFAULT_POOL_FILE
+
+    with MetadataCatalog(get_catalog_path(args.test)) as catalog:
+        if args.command in ("import", "enable"):
+            if catalog.enabled:
+                raise SystemExit("❌ The app is editing this catalog, so the CSVs may be out of date. "
+                                 "Run 'disable' first (it exports everything back to the CSVs).")
+            for csv_path in sorted(data_dir.glob("*.csv")):
+                catalog.import_csv(csv_path)
+            catalog.import_pools(pool_file)
+            print(f"Catalog saved: {catalog.db_path}")
+        else:
+            for name in catalog.dataset_names():
+                catalog.export_csv(name)
+            catalog.export_pools(pool_file)
+
+        if args.command in ("enable", "disable"):
+            catalog.set_enabled(args.command == "enable")
+            print(f"✅ The app now edits the {'catalog' if args.command == 'enable' else 'CSVs'}")
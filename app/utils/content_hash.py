@@ -0,0 +1,142 @@
+# utils/content_hash.py
+"""
+Exact-duplicate photo detection.
+
+Files are grouped by size first; only files that share a size are hashed (SHA-256,
+read in chunks on a thread pool). Hashes are cached in a JSON store keyed by
+path and invalidated by size/mtime, so re-scanning an unchanged archive only stats files.
+
+Run from the app/ folder:
+    python -m utils.content_hash [--test]
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from utils.paths import (
+    DATA_DIR,
+    DATA_TEST_DIR,
+    PHOTOS_ORIGINAL_DIR,
+    PHOTOS_RENAMED_DIR,
+    PHOTOS_TEST_ORIGINAL_DIR,
+    PHOTOS_TEST_RENAMED_DIR,
+)
+
+CHUNK_SIZE = 1024 * 1024
+HASH_WORKERS = 8
+
+
+def get_hash_cache_path(test_mode: bool = False) -> Path:
+    return (DATA_TEST_DIR if test_mode else DATA_DIR) / "content_hashes.json"
+
+
+def hash_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 of a file, read in chunks so large scans never sit in memory whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentHashCache:
+    def __init__(self, cache_file: Path):
+        self.cache_file = Path(cache_file)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries: dict[str, dict] = {}
+        if self.cache_file.exists():
+            try:
+                with self.cache_file.open("r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                self.entries = {}
+
+    def get(self, path: Path, stat: os.stat_result | None = None) -> str:
+        """Hash of a file, from the cache when its size and mtime are unchanged."""
+        stat = stat or os.stat(path)
+        key = str(path)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = hash_file(path)
+        with self._lock:
+            self.entries[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._dirty = True
+        return digest
+
+    def record(self, path: Path, digest: str):
+        """Store a hash we already know (e.g. of a file we just wrote) without re-reading it."""
+        stat = os.stat(path)
+        with self._lock:
+            self.entries[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_name(self.cache_file.name + ".tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.cache_file)
+            self._dirty = False
+
+
+def find_exact_duplicates(paths, cache: ContentHashCache, workers: int = HASH_WORKERS) -> list[list[Path]]:
+    """
+    Return groups of byte-identical files (each group in input order, two or more files).
+    Only files that share a size with another file are hashed at all.
+    """
+    by_size = defaultdict(list)
+    for path in map(Path, paths):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        by_size[stat.st_size].append((path, stat))
+
+    candidates = [item for group in by_size.values() if len(group) > 1 for item in group]
+    if not candidates:
+        return []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda item: cache.get(*item), candidates))
+
+    by_hash = defaultdict(list)
+    for (path, _), digest in zip(candidates, digests):
+        by_hash[digest].append(path)
+
+    order = {path: i for i, path in enumerate(map(Path, paths))}
+    return [sorted(group, key=order.__getitem__) for group in by_hash.values() if len(group) > 1]
+
+
+def format_duplicate_report(groups: list[list[Path]]) -> str:
+    if not groups:
+        return "No exact duplicates found."
+    lines = [f"{len(groups)} sets of identical files:"]
+    for group in groups:
+        lines.append("  " + " = ".join(str(p) for p in group))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report byte-identical photos")
+    parser.add_argument("--test", action="store_true", help="Use test directories")
+    args = parser.parse_args()
+
+    original_dir = PHOTOS_TEST_ORIGINAL_DIR if args.test else PHOTOS_ORIGINAL_DIR
+    renamed_dir = PHOTOS_TEST_RENAMED_DIR if args.test else PHOTOS_RENAMED_DIR
+
+    cache = ContentHashCache(get_hash_cache_path(args.test))
+    groups = find_exact_duplicates(sorted(renamed_dir.glob("*.*")) + sorted(original_dir.glob("*.*")), cache)
+    cache.save()
+    print(format_duplicate_report(groups))
@@ -1,22 +1,241 @@
 # utils/csv_loader.py
+"""
+CSV loading with an on-disk cache of parsed DataFrames.
+
+A CSV is parsed once; the DataFrame is stored under cache/datasets (Feather when pyarrow
+is installed, pickle otherwise), keyed by the CSV's path, size and mtime. Loading an
+unchanged file again reads the binary copy instead of running pd.read_csv, and a
+directory is loaded on a thread pool. Every load returns a fresh DataFrame, so callers
+can modify it freely.
+
+Read-only callers can ask for a column projection (only those columns are parsed) and
+compact dtypes (categoricals, Arrow strings, nullable/downcast integers). Compact frames
+don't write back to CSV byte for byte, so anything that saves a CSV loads it in full.
+
+Run from the app/ folder for a memory report:
+    python -m utils.csv_loader [--test] [--columns ID Title Description]
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 import pandas as pd
+from utils.paths import DATA_DIR, DATA_TEST_DIR, DATASET_CACHE_DIR
+
+try:
+    import pyarrow  # noqa: F401  (needed for Feather)
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+LOAD_WORKERS = 4
+CACHE_VERSION = 1  # bump when the parsing options change, so old cache files are ignored
+CATEGORY_MAX_RATIO = 0.5  # text columns with at most this share of distinct values become categoricals
+
+
+def _path_key(csv_file: Path) -> str:
+    return hashlib.sha1(str(Path(csv_file).resolve()).encode("utf-8")).hexdigest()
+
+
+def _cache_files(csv_file: Path, stat: os.stat_result, cache_dir: Path,
+                 columns=None, compact: bool = False) -> list[Path]:
+    """
+    Candidate cache files for this version of the CSV and these load options, preferred format first.
+    Named <path>-<file version>-<options>, so every projection of one CSV version can be cached side by side.
+    """
+    version = hashlib.sha1(f"{stat.st_size}|{stat.st_mtime_ns}|{CACHE_VERSION}".encode("utf-8")).hexdigest()[:16]
+    projection = "*" if columns is None else "\x1f".join(sorted(columns))
+    options = hashlib.sha1(f"{projection}|{compact}".encode("utf-8")).hexdigest()[:8]
+    stem = f"{_path_key(csv_file)}-{version}-{options}"
+    files = [cache_dir / f"{stem}.feather"] if HAVE_PYARROW else []
+    return files + [cache_dir / f"{stem}.pkl"]
+
+
+def _read_cached(cache_file: Path) -> pd.DataFrame:
+    if cache_file.suffix == ".pkl":
+        with cache_file.open("rb") as f:
+            return pickle.load(f)
+    df = pd.read_feather(cache_file)
+    # Arrow turns missing values in text columns into None; read_csv gives NaN
+    text = df.columns[df.dtypes == object]
+    if len(text):
+        df[text] = df[text].where(df[text].notna(), np.nan)
+    return df
+
+
+def _write_cached(df: pd.DataFrame, csv_file: Path, cache_files: list[Path], cache_dir: Path):
+    """Store the parsed DataFrame (atomically) and drop cache files of older versions of the same CSV."""
+    path_key, version, _ = cache_files[0].stem.split("-")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for old in cache_dir.glob(f"{path_key}-*"):
+            if old.name.split("-")[1] != version:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"⚠ Could not prepare the dataset cache for {csv_file.name}: {e}")
+        return
+
+    for cache_file in cache_files:
+        tmp_path = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if cache_file.suffix == ".pkl":
+                with tmp_path.open("wb") as f:
+                    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                df.to_feather(tmp_path)  # fails on mixed-type columns; pickle takes those
+            os.replace(tmp_path, cache_file)
+            return
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            last_error = e
+    print(f"⚠ Could not cache {csv_file.name}: {last_error}")
+
+
+# -----------------------------
+# COMPACT DTYPES
+# -----------------------------
+def _smallest_int(s: pd.Series, nullable: bool) -> pd.Series:
+    for dtype in ("Int8", "Int16", "Int32", "Int64") if nullable else ("int8", "int16", "int32", "int64"):
+        info = np.iinfo(dtype.lower())
+        if s.min() >= info.min and s.max() <= info.max:
+            return s.astype(dtype)
+    return s
+
+
+def compact_column(s: pd.Series) -> pd.Series:
+    """Smallest lossless dtype for one column as read_csv parsed it."""
+    values = s.dropna()
+    if values.empty:
+        return s.astype("category")  # an unused column: one byte per row instead of eight
+    if s.dtype == object:
+        kind = pd.api.types.infer_dtype(values, skipna=False)
+        if kind == "boolean":
+            return s.astype("boolean")
+        if kind != "string":
+            return s  # mixed types stay as they are
+        if values.nunique() <= CATEGORY_MAX_RATIO * len(values):
+            return s.astype("category")
+        return s.astype("string[pyarrow]") if HAVE_PYARROW else s
+    if pd.api.types.is_float_dtype(s) and (values == values.round()).all():
+        return _smallest_int(s, nullable=True)  # integers that read_csv turned into floats because of gaps
+    if pd.api.types.is_integer_dtype(s):
+        return _smallest_int(s, nullable=False)
+    return s
+
 
-def load_csvs_from_dir(data_dir: Path) -> dict[str, pd.DataFrame]:
-    """Load all CSV files in a directory into a dict keyed by filename stem, storing the path in df.attrs."""
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Categoricals for repetitive text, Arrow strings for the rest, nullable and downcast integers."""
+    compacted = pd.DataFrame({column: compact_column(df[column]) for column in df.columns}, index=df.index)
+    compacted.attrs = dict(df.attrs)
+    return compacted
+
+
+# -----------------------------
+# LOADING
+# -----------------------------
+def read_csv_cached(csv_file: Path, cache_dir: Path = DATASET_CACHE_DIR,
+                    columns=None, compact: bool = False) -> pd.DataFrame:
+    """
+    pd.read_csv(csv_file), served from the parsed-dataset cache when the file hasn't changed.
+    columns: only parse these (names a CSV doesn't have are ignored); compact: apply compact_dtypes.
+    """
+    csv_file = Path(csv_file)
+    cache_dir = Path(cache_dir)
+    cache_files = _cache_files(csv_file, os.stat(csv_file), cache_dir, columns, compact)
+
+    for cache_file in cache_files:
+        try:
+            df = _read_cached(cache_file)
+            break
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable cache for {csv_file.name}: {e}")
+            cache_file.unlink(missing_ok=True)
+    else:
+        wanted = None if columns is None else set(columns)
+        df = pd.read_csv(csv_file, usecols=None if wanted is None else lambda c: c in wanted)
+        if compact:
+            df = compact_dtypes(df)
+        _write_cached(df, csv_file, cache_files, cache_dir)
+
+    df.attrs["file_path"] = str(csv_file)  # attach full path
+    return df
+
+
+def load_csvs_from_dir(data_dir: Path, use_cache: bool = True, workers: int = LOAD_WORKERS,
+                       cache_dir: Path = DATASET_CACHE_DIR, columns=None,
+                       compact: bool = False) -> dict[str, pd.DataFrame]:
+    """
+    Load all CSV files in a directory into a dict keyed by filename stem, storing the path in df.attrs.
+    columns / compact: see read_csv_cached (only for callers that never write the CSVs back).
+    """
     csv_files = sorted(data_dir.glob("*.csv"))
-    datasets = {}
-    for csv_file in csv_files:
+
+    def load(csv_file):
         try:
-            df = pd.read_csv(csv_file)
-            df.attrs["file_path"] = str(csv_file)  # attach full path
-            datasets[csv_file.stem] = df
-            print(f"Loaded {csv_file.name} ({len(df)} rows, {len(df.columns)} columns)")
-            print(f"Path to CSV: {csv_file}")  # <-- added print
+            if use_cache:
+                return read_csv_cached(csv_file, cache_dir, columns=columns, compact=compact), None
+            wanted = None if columns is None else set(columns)
+            df = pd.read_csv(csv_file, usecols=None if wanted is None else lambda c: c in wanted)
+            df = compact_dtypes(df) if compact else df
+            df.attrs["file_path"] = str(csv_file)
+            return df, None
         except Exception as e:
-            print(f"Failed to read {csv_file.name}: {e}")
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(csv_files) or 1))) as pool:
+        results = list(pool.map(load, csv_files))
+
+    datasets = {}
+    for csv_file, (df, error) in zip(csv_files, results):
+        if error is not None:
+            print(f"Failed to read {csv_file.name}: {error}")
+            continue
+        datasets[csv_file.stem] = df
+        print(f"Loaded {csv_file.name} ({len(df)} rows, {len(df.columns)} columns)")
+        print(f"Path to CSV: {csv_file}")  # <-- added print
     return datasets
 
+
+def memory_report(data_dir: Path, columns=None, compact: bool = True) -> str:
+    """Per dataset: columns and in-memory size loaded in full vs. with this projection / compact dtypes."""
+    lines = ["--- Dataset Memory ---"]
+    total_full = total_slim = 0
+    for csv_file in sorted(data_dir.glob("*.csv")):
+        try:
+            full = read_csv_cached(csv_file)
+            slim = read_csv_cached(csv_file, columns=columns, compact=compact)
+        except Exception as e:
+            lines.append(f"{csv_file.stem}: failed to read ({e})")
+            continue
+        full_bytes = int(full.memory_usage(deep=True).sum())
+        slim_bytes = int(slim.memory_usage(deep=True).sum())
+        total_full += full_bytes
+        total_slim += slim_bytes
+        saved = 1 - slim_bytes / full_bytes if full_bytes else 0.0
+        lines.append(f"{csv_file.stem}: {len(full.columns)} -> {len(slim.columns)} columns, "
+                     f"{full_bytes / 1e6:.1f} MB -> {slim_bytes / 1e6:.1f} MB ({saved:.0%} saved)")
+    if total_full:
+        lines.append(f"Total: {total_full / 1e6:.1f} MB -> {total_slim / 1e6:.1f} MB "
+                     f"({1 - total_slim / total_full:.0%} saved)")
+    return "\n".join(lines)
+
+
 def validate_variable_name(name: str) -> bool:
     """Check if a string is a valid Python identifier."""
-    return name.isidentifier()
\ No newline at end of file
+    return name.isidentifier()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report how much memory projection and compact dtypes save")
+    parser.add_argument("--test", action="store_true", help="Use test data folder")
+    parser.add_argument("--columns", nargs="+", default=None, help="Columns to keep (default: all)")
+    parser.add_argument("--no-compact", action="store_true", help="Keep read_csv's dtypes")
+    args = parser.parse_args()
+
+    print(memory_report(DATA_TEST_DIR if args.test else DATA_DIR, columns=args.columns, compact=not args.no_compact))
@@ -0,0 +1,166 @@
+# utils/csv_writer.py
+"""
+Deferred, atomic CSV saving for interactive editing.
+
+Edits go through DeferredCsvWriter.update(), which ignores unchanged values and marks
+the row dirty. A background thread writes the file when the oldest unsaved edit is
+flush_interval seconds old, when max_dirty rows are waiting, or on flush()/close().
+Each write goes to a temp file in the same folder and is swapped in with os.replace,
+so a crash never leaves a half-written CSV.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+import pandas as pd
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_DIRTY = 25
+RETRY_DELAY = 10.0
+
+
+def write_csv_atomic(df: pd.DataFrame, path: Path):
+    """Write a CSV to a temp file, fsync it, then replace the original in one step."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8", newline="") as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def same_value(old, new) -> bool:
+    if pd.isna(old) and (new is None or new == "" or (not isinstance(new, str) and pd.isna(new))):
+        return True
+    return str(old) == str(new)
+
+
+class DeferredCsvWriter:
+    def __init__(self, df: pd.DataFrame, path: Path, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_dirty: int = DEFAULT_MAX_DIRTY):
+        """
+        df: the DataFrame being edited (only modify it through update() while the writer is open)
+        path: CSV file it is saved to
+        """
+        self.df = df
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.max_dirty = max(1, max_dirty)
+        self.dirty_rows: set[int] = set()
+        self.writes = 0
+
+        self._cond = threading.Condition()
+        self._first_dirty_at = None
+        self._retry_at = 0.0
+        self._flush_requested = 0   # flush() generations asked for ...
+        self._flush_completed = 0   # ... and written
+        self._closed = False
+        self._stopped = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+        self._thread.start()
+
+    def update(self, row: int, column: str, value) -> bool:
+        """Set one cell; returns False (and schedules nothing) if the value didn't change."""
+        with self._cond:
+            if same_value(self.df.at[row, column], value):
+                return False
+            if self.df[column].dtype != object:
+                self.df[column] = self.df[column].astype(object)
+            self.df.at[row, column] = value
+            self.dirty_rows.add(row)
+            if self._first_dirty_at is None:
+                self._first_dirty_at = time.monotonic()
+            if len(self.dirty_rows) >= self.max_dirty:
+                self._cond.notify()
+        return True
+
+    @property
+    def is_dirty(self) -> bool:
+        with self._cond:
+            return bool(self.dirty_rows)
+
+    def flush(self, wait: bool = True):
+        """Write any pending edits now (blocking until written unless wait=False)."""
+        with self._cond:
+            self._flush_requested += 1
+            target = self._flush_requested
+            self._cond.notify()
+            if wait:
+                while self._flush_completed < target and not self._stopped:
+                    self._cond.wait()
+                self._raise_error()
+
+    def close(self):
+        """
+        Flush pending edits and stop the writer thread.
+        If the last write fails the thread keeps retrying in the background and close() raises;
+        call it again once the problem is fixed.
+        """
+        with self._cond:
+            self._closed = True
+            self._flush_requested += 1
+            target = self._flush_requested
+            self._cond.notify()
+            while not self._stopped:
+                if self._flush_completed >= target:
+                    self._raise_error()
+                self._cond.wait()
+        self._thread.join()
+
+    def _raise_error(self):
+        # The last failure stands until the rows it left unsaved have been written
+        if self._error is not None and self.dirty_rows:
+            raise self._error
+
+    def _due(self) -> bool:
+        if self._flush_requested > self._flush_completed:
+            return True
+        if not self.dirty_rows:
+            return self._closed
+        if time.monotonic() < self._retry_at:
+            return False
+        return (self._closed or len(self.dirty_rows) >= self.max_dirty
+                or time.monotonic() - self._first_dirty_at >= self.flush_interval)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    timeout = None
+                    if self._first_dirty_at is not None:
+                        wake_at = self._retry_at if self._closed else max(
+                            self._first_dirty_at + self.flush_interval, self._retry_at)
+                        timeout = max(0.0, wake_at - time.monotonic())
+                    self._cond.wait(timeout)
+
+                target = self._flush_requested
+                closing = self._closed
+                snapshot = None
+                if self.dirty_rows:
+                    snapshot, rows = self.df.copy(), self.dirty_rows
+                    self.dirty_rows, self._first_dirty_at = set(), None
+
+            if snapshot is not None:
+                try:
+                    write_csv_atomic(snapshot, self.path)
+                    self.writes += 1
+                    with self._cond:
+                        self._error = None
+                except Exception as e:
+                    print(f"❌ Failed to save {self.path.name}: {e}")
+                    with self._cond:
+                        self._error = e
+                        self.dirty_rows |= rows  # keep them for the next attempt
+                        self._first_dirty_at = self._first_dirty_at or time.monotonic()
+                        self._retry_at = time.monotonic() + RETRY_DELAY
+
+            with self._cond:
+                self._flush_completed = max(self._flush_completed, target)
+                # Closing only stops the thread once everything is saved; a failed write is retried
+                if closing and not self.dirty_rows:
+                    self._stopped = True
+                self._cond.notify_all()
+                if self._stopped:
+                    return
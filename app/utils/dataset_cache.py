@@ -0,0 +1,95 @@
+# utils/dataset_cache.py
+"""
+Lazily loaded, memory-bounded set of editable CSV datasets.
+
+A CSV is read (through the parsed-dataset cache) the first time it is asked for and
+kept in an LRU together with its DeferredCsvWriter. When the loaded DataFrames go over
+the memory ceiling, the least recently used ones are flushed (if they have unsaved
+edits) and dropped.
+
+With a catalog (see utils/catalog.py) datasets it holds are read from it instead, and
+edits are saved as single-row updates by a CatalogWriter.
+"""
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+from utils.csv_loader import read_csv_cached
+from utils.catalog import CatalogWriter, MetadataCatalog
+from utils.csv_writer import DeferredCsvWriter
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DatasetCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, catalog: MetadataCatalog | None = None):
+        self.max_bytes = max_bytes
+        self.catalog = catalog
+        self._entries: OrderedDict[Path, tuple[pd.DataFrame, DeferredCsvWriter, int]] = OrderedDict()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries.values())
+
+    def __contains__(self, path) -> bool:
+        return Path(path) in self._entries
+
+    def get(self, path: Path) -> tuple[pd.DataFrame, DeferredCsvWriter]:
+        """Return (DataFrame, writer) for a CSV, loading it on first use."""
+        path = Path(path)
+        if path in self._entries:
+            self._entries.move_to_end(path)
+            df, writer, _ = self._entries[path]
+            return df, writer
+
+        if self.catalog is not None and path.stem in self.catalog.dataset_names():
+            df = self.catalog.get_dataframe(path.stem)
+            df.attrs["file_path"] = str(path)
+            writer = CatalogWriter(self.catalog, path.stem, df)
+        else:
+            df = read_csv_cached(path)
+            writer = DeferredCsvWriter(df, path)
+        self._entries[path] = (df, writer, int(df.memory_usage(deep=True).sum()))
+        print(f"Loaded {path.name} for review ({len(df)} rows)")
+        self._evict(keep=path)
+        return df, writer
+
+    def _evict(self, keep: Path):
+        for path in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                return
+            if path != keep:
+                self.release(path)
+
+    def release(self, path: Path):
+        """Flush a dataset's pending edits and drop it from memory (kept while any edit is unsaved)."""
+        path = Path(path)
+        entry = self._entries.get(path)
+        if entry is None:
+            return
+        writer = entry[1]
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"❌ Keeping {path.name} in memory, its edits could not be saved: {e}")
+            return
+        if writer.is_dirty:
+            print(f"❌ Keeping {path.name} in memory, it still has unsaved edits")
+            return
+        del self._entries[path]
+        print(f"Released {path.name} from the review cache")
+
+    def close(self):
+        """Flush and drop every dataset; raises the first save error after trying them all."""
+        errors = []
+        for path, (_, writer, _) in list(self._entries.items()):
+            try:
+                writer.close()
+            except Exception as e:
+                errors.append(f"{path.name}: {e}")
+                continue
+            if writer.is_dirty:
+                errors.append(f"{path.name}: edits are still unsaved")
+            else:
+                del self._entries[path]
+        if errors:
+            raise RuntimeError("Could not save:\n" + "\n".join(errors))
@@ -0,0 +1,277 @@
+# utils/edit_recipes.py
+"""
+Non-destructive photo cleaning.
+
+Cleaning settings are stored as small JSON recipes, one per photo ID, and the renamed
+masters are never rewritten. A cleaned image (a derivative) is only rendered when
+something asks for it, and is then kept in a bounded on-disk cache keyed by the master's
+path, size, mtime and the recipe. Re-tuning a batch is just editing recipes; nothing is
+decoded until a derivative is needed again. The cache can drop any derivative, so cleaned
+files meant to be kept are exported to a folder of their own.
+
+Run from the app/ folder:
+    python -m utils.edit_recipes set [--test] [--brightness 1.1] [--contrast 1.1] [--denoise 0.3] [IDs...]
+    python -m utils.edit_recipes clear [--test] [IDs...]
+    python -m utils.edit_recipes list [--test]
+    python -m utils.edit_recipes export DEST [--test] [IDs...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from PIL import Image
+from utils.image_adjust import DENOISE_METHODS, apply_adjustments
+from utils.thumbnail_cache import ThumbnailCache
+from utils.paths import (
+    DATA_DIR,
+    DATA_TEST_DIR,
+    DERIVATIVE_CACHE_DIR,
+    PHOTOS_RENAMED_DIR,
+    PHOTOS_TEST_RENAMED_DIR,
+)
+
+RECIPE_FIELDS = ("brightness", "contrast", "denoise", "rotation", "denoise_method", "max_size")
+NEUTRAL_RECIPE = {"brightness": 1.0, "contrast": 1.0, "denoise": 0.0, "rotation": 0}
+DERIVATIVE_QUALITY = 95
+DEFAULT_DERIVATIVE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def get_recipes_dir(test_mode: bool = False) -> Path:
+    return (DATA_TEST_DIR if test_mode else DATA_DIR) / "recipes"
+
+
+def photo_id(path: Path) -> str:
+    """ID a photo's recipe is stored under: its stem, as in the photo index (1990.12.3.jpg -> "1990.12.3")."""
+    return Path(path).stem
+
+
+def normalize_recipe(recipe: dict) -> dict:
+    """Known fields only, defaults left out, so equal settings always give the same recipe key."""
+    recipe = {field: recipe[field] for field in RECIPE_FIELDS if recipe.get(field) is not None}
+    if recipe.get("denoise_method", "median") not in DENOISE_METHODS:
+        raise ValueError(f"Unknown denoise method '{recipe['denoise_method']}', expected one of {DENOISE_METHODS}")
+    if recipe.get("denoise_method") == "median" or not recipe.get("denoise"):
+        recipe.pop("denoise_method", None)  # the default, or no denoising for it to apply to
+    if not recipe.get("max_size"):
+        recipe.pop("max_size", None)
+    recipe["rotation"] = int(recipe.get("rotation", 0)) % 360
+    return recipe
+
+
+def recipe_key(recipe: dict) -> str:
+    return hashlib.sha256(json.dumps(normalize_recipe(recipe), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def is_neutral(recipe: dict) -> bool:
+    """True if the recipe leaves the photo exactly as it is."""
+    return normalize_recipe({**NEUTRAL_RECIPE, **recipe}) == normalize_recipe(NEUTRAL_RECIPE)
+
+
+# -----------------------------
+# RECIPES
+# -----------------------------
+class RecipeStore:
+    def __init__(self, recipes_dir: Path):
+        """One <ID>.json sidecar per cleaned photo."""
+        self.recipes_dir = Path(recipes_dir)
+
+    def _path(self, image_id: str) -> Path:
+        return self.recipes_dir / f"{image_id}.json"
+
+    def __contains__(self, image_id) -> bool:
+        return self._path(str(image_id)).exists()
+
+    def get(self, image_id: str) -> dict | None:
+        try:
+            with self._path(image_id).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠ Ignoring unreadable recipe for {image_id}: {e}")
+            return None
+
+    def set(self, image_id: str, recipe: dict):
+        """Store a recipe (written to a temp file, then swapped in)."""
+        self.recipes_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(image_id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(normalize_recipe(recipe), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def delete(self, image_id: str) -> bool:
+        try:
+            self._path(image_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def ids(self) -> list[str]:
+        if not self.recipes_dir.exists():
+            return []
+        return sorted(path.stem for path in self.recipes_dir.glob("*.json"))
+
+
+def get_recipe_store(test_mode: bool = False) -> RecipeStore:
+    return RecipeStore(get_recipes_dir(test_mode))
+
+
+# -----------------------------
+# RENDERING
+# -----------------------------
+def render(path: Path, recipe: dict) -> Image.Image:
+    """Decode a master and apply a recipe to it."""
+    with Image.open(path) as img:
+        cleaned = apply_adjustments(
+            img.convert("RGB"),
+            brightness=recipe.get("brightness", 1.0),
+            contrast=recipe.get("contrast", 1.0),
+            denoise=recipe.get("denoise", 0.0),
+            rotation=recipe.get("rotation", 0),
+            denoise_method=recipe.get("denoise_method", "median"),
+        )
+    if recipe.get("max_size"):
+        cleaned.thumbnail((recipe["max_size"], recipe["max_size"]))
+    return cleaned
+
+
+def render_preview(proxy: Image.Image, recipe: dict, scale: float) -> Image.Image:
+    """Apply a recipe to a low-resolution proxy (scale: proxy size relative to the master)."""
+    return apply_adjustments(
+        proxy,
+        brightness=recipe.get("brightness", 1.0),
+        contrast=recipe.get("contrast", 1.0),
+        denoise=recipe.get("denoise", 0.0),
+        rotation=recipe.get("rotation", 0),
+        scale=scale,
+        denoise_method=recipe.get("denoise_method", "median"),
+    )
+
+
+class DerivativeCache(ThumbnailCache):
+    quality = DERIVATIVE_QUALITY
+
+    def __init__(self, cache_dir: Path = DERIVATIVE_CACHE_DIR, max_bytes: int = DEFAULT_DERIVATIVE_MAX_BYTES):
+        """Rendered derivatives, keyed by (master path, size, mtime, recipe) and bounded like the thumbnails."""
+        super().__init__(cache_dir, max_bytes)
+
+    def _derivative_key(self, path: Path, recipe: dict) -> Path:
+        stat = os.stat(path)
+        raw = f"{Path(path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{recipe_key(recipe)}"
+        return self.cache_dir / f"{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.jpg"
+
+    def is_cached(self, path: Path, recipe: dict) -> bool:
+        return self._derivative_key(path, recipe).exists()
+
+    def get(self, path: Path, recipe: dict) -> Path | None:
+        """Return the derivative file for a master + recipe, rendering it on a miss."""
+        cache_file = self._derivative_key(path, recipe)
+        try:
+            os.utime(cache_file)  # mark as recently used
+            return cache_file
+        except FileNotFoundError:
+            pass
+
+        self._store(cache_file, render(path, recipe))
+        return cache_file if cache_file.exists() else None
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_derivative_cache() -> DerivativeCache:
+    """Return the application-wide derivative cache."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = DerivativeCache()
+        return _shared_cache
+
+
+def get_derivative(photo_path: Path, store: RecipeStore) -> Path | None:
+    """
+    The file to use for a photo: its cleaned derivative if it has a recipe (rendered now if
+    needed), otherwise the untouched master. None if the derivative could not be stored.
+    """
+    recipe = store.get(photo_id(photo_path))
+    if recipe is None or is_neutral(recipe):
+        return Path(photo_path)
+    return get_derivative_cache().get(photo_path, recipe)
+
+
+def export_derivatives(photo_files, store: RecipeStore, dest_dir: Path) -> tuple[int, list[str]]:
+    """
+    Write the cleaned derivative of every photo with a recipe to dest_dir as <ID>.jpg, outside
+    the cache so it is never evicted. Returns (files written, failed file names).
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    cache = get_derivative_cache()
+    written, failed = 0, []
+    for path in map(Path, photo_files):
+        recipe = store.get(photo_id(path))
+        if recipe is None or is_neutral(recipe):
+            continue
+        dest = dest_dir / f"{photo_id(path)}.jpg"
+        try:
+            cached = cache.get(path, recipe)
+            if cached is not None:
+                shutil.copyfile(cached, dest)
+            else:
+                render(path, recipe).save(dest, "JPEG", quality=DERIVATIVE_QUALITY)
+        except OSError as e:
+            failed.append(path.name)
+            print(f"❌ {path.name}: {e}")
+            continue
+        written += 1
+    return written, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Edit the cleaning recipes of the renamed photos")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    set_parser = sub.add_parser("set", help="Create or update recipes (only the given settings change)")
+    set_parser.add_argument("--brightness", type=float)
+    set_parser.add_argument("--contrast", type=float)
+    set_parser.add_argument("--denoise", type=float)
+    set_parser.add_argument("--rotation", type=int)
+    set_parser.add_argument("--denoise-method", choices=DENOISE_METHODS)
+    set_parser.add_argument("--max-size", type=int, help="Longest side of the derivative (0: full size)")
+
+    clear_parser = sub.add_parser("clear", help="Remove recipes, so the masters are used as they are")
+    list_parser = sub.add_parser("list", help="Print every recipe")
+    export_parser = sub.add_parser("export", help="Write cleaned photos to a folder outside the cache")
+    export_parser.add_argument("dest", type=Path, help="Folder to write <ID>.jpg derivatives to")
+    for p in (set_parser, clear_parser, list_parser, export_parser):
+        p.add_argument("--test", action="store_true", help="Use test directories")
+    for p in (set_parser, clear_parser, export_parser):
+        p.add_argument("ids", nargs="*", help="Photo IDs (default: every renamed photo / every recipe)")
+    args = parser.parse_args()
+
+    store = get_recipe_store(args.test)
+    if args.command == "set":
+        changes = {field: getattr(args, field) for field in RECIPE_FIELDS if getattr(args, field) is not None}
+        renamed_dir = PHOTOS_TEST_RENAMED_DIR if args.test else PHOTOS_RENAMED_DIR
+        ids = args.ids or sorted({photo_id(p) for p in renamed_dir.glob("*.*")})
+        for image_id in ids:
+            store.set(image_id, {**NEUTRAL_RECIPE, **(store.get(image_id) or {}), **changes})
+        print(f"✅ Updated {len(ids)} recipes in {store.recipes_dir}")
+    elif args.command == "clear":
+        ids = args.ids or store.ids()
+        removed = sum(store.delete(image_id) for image_id in ids)
+        print(f"✅ Removed {removed} recipes from {store.recipes_dir}")
+    elif args.command == "export":
+        renamed_dir = PHOTOS_TEST_RENAMED_DIR if args.test else PHOTOS_RENAMED_DIR
+        wanted = set(args.ids or store.ids())
+        photo_files = [p for p in sorted(renamed_dir.glob("*.*")) if photo_id(p) in wanted]
+        written, failed = export_derivatives(photo_files, store, args.dest)
+        print(f"✅ Exported {written} cleaned photos to {args.dest}" + (f" ({len(failed)} failed)" if failed else ""))
+    else:
+        for image_id in store.ids():
+            print(f"{image_id}: {json.dumps(store.get(image_id), sort_keys=True)}")
@@ -1,6 +1,7 @@
 import re
 import pandas as pd
 from pathlib import Path
+from utils.catalog import open_catalog
 from utils.paths import DATA_DIR, DATA_TEST_DIR
 
 def generate_new_ids_for_csv(csv_name: str, num_new: int = 10, test_mode: bool = False) -> None:
@@ -22,8 +23,25 @@ def generate_new_ids_for_csv(csv_name: str, num_new: int = 10, test_mode: bool =
 
     print(f"Generating new IDs for: {csv_path}")
 
-    # Load the CSV
-    df = pd.read_csv(csv_path)
+    # With the catalog enabled the new rows are inserted there instead of rewriting the CSV
+    catalog = open_catalog(test_mode)
+    if catalog is not None and csv_name not in catalog.dataset_names():
+        catalog.close()
+        catalog = None
+
+    try:
+        _generate_new_ids(csv_path, csv_name, num_new, catalog)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def _generate_new_ids(csv_path: Path, csv_name: str, num_new: int, catalog) -> None:
+    # Load the dataset
+    if catalog is not None:
+        df = catalog.get_dataframe(csv_name, columns=[c for c in catalog.columns(csv_name) if c == "ID"] or None)
+    else:
+        df = pd.read_csv(csv_path)
 
     if "ID" not in df.columns:
         print(f"❌ 'ID' column not found in {csv_name}.csv")
@@ -45,6 +63,12 @@ def generate_new_ids_for_csv(csv_name: str, num_new: int = 10, test_mode: bool =
     # Generate new IDs
     new_ids = [f"{prefix}{str(i).zfill(5)}" for i in range(max_num + 1, max_num + 1 + num_new)]
 
+    if catalog is not None:
+        catalog.append_rows(csv_name, [{"ID": new_id} for new_id in new_ids])
+        print(f"Added {num_new} new IDs to '{csv_name}' in the catalog")
+        print(f"Last new ID: {new_ids[-1]}")
+        return
+
     # Create empty rows with only IDs
     new_rows = pd.DataFrame({col: [None] * num_new for col in df.columns})
     new_rows["ID"] = new_ids
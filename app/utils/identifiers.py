@@ -1,5 +1,8 @@
 # utils/identifiers.py
 import json
+import os
+import threading
+from collections import deque
 from pathlib import Path
 import pandas as pd
 from utils.paths import DOCS_BASE
@@ -12,6 +15,81 @@ DOCUMENTS_TEST_DIR = DOCUMENTS_DATA_DIR / "test"
 DEFAULT_POOL_FILE = DOCUMENTS_DATA_DIR / "available_ids.json"
 TEST_POOL_FILE = DOCUMENTS_TEST_DIR / "available_ids_test.json"
 
+# Journal records appended before the snapshot is rewritten in the background
+COMPACT_EVERY = 1000
+
+
+def journal_path_for(pool_file: Path) -> Path:
+    """Journal that sits next to a pool snapshot, e.g. available_ids.json.journal."""
+    return pool_file.with_name(pool_file.name + ".journal")
+
+
+def fingerprints_path_for(pool_file: Path) -> Path:
+    """Per-CSV fingerprints from the last rebuild, e.g. available_ids.json.fingerprints."""
+    return pool_file.with_name(pool_file.name + ".fingerprints")
+
+
+def _take(ids: deque, identifier: str):
+    """Remove an ID that was handed out; O(1) when it is at the front, as it normally is."""
+    if ids and ids[0] == identifier:
+        ids.popleft()
+    elif identifier in ids:
+        ids.remove(identifier)
+
+
+def _apply_journal_record(pool: dict[str, deque], record: dict):
+    """Apply one journal record. Records are idempotent so replaying twice is harmless."""
+    ids = pool.setdefault(record["csv"], deque())
+    op = record["op"]
+    if op == "pop":
+        _take(ids, record["id"])
+    elif op == "add":
+        if record["id"] not in ids:
+            ids.append(record["id"])
+    elif op == "reserve":
+        for identifier in record["ids"]:
+            _take(ids, identifier)
+    elif op == "release":
+        present = set(ids)
+        ids.extendleft(reversed([i for i in record["ids"] if i not in present]))
+
+
+def load_pool_file(pool_file: Path) -> dict[str, deque]:
+    """Load a pool snapshot (plain {csv_name: [ids]} JSON) and replay its journal on top."""
+    pool = {}
+    if pool_file.exists():
+        with pool_file.open("r", encoding="utf-8") as f:
+            pool = {name: deque(ids) for name, ids in json.load(f).items()}
+
+    journal_file = journal_path_for(pool_file)
+    if journal_file.exists():
+        with journal_file.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a torn last line; everything before it is intact
+                    break
+                _apply_journal_record(pool, record)
+    return pool
+
+
+def _write_json_atomic(path: Path, data):
+    """Write JSON to a temp file and swap it in, so readers never see a half-written file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_pool_file(pool_file: Path, pool: dict):
+    """Replace a pool snapshot with {csv_name: [ids]} and drop the journal it supersedes."""
+    pool_file.parent.mkdir(parents=True, exist_ok=True)
+    _write_json_atomic(pool_file, {name: list(ids) for name, ids in pool.items()})
+    journal_path_for(pool_file).unlink(missing_ok=True)
+
 
 class IdentifierPool:
     def __init__(
@@ -21,76 +99,207 @@ class IdentifierPool:
         title_col: str = "Title",
         rebuild: bool = False,
         test_mode: bool = False,
+        pool_file: Path | None = None,
+        read_only: bool = False,
     ):
         """
         csv_datasets: dictionary of {variable_name: DataFrame} from assigned CSVs
         id_col: column name containing unique IDs
         title_col: column name to check if used/assigned
         rebuild: if True, rebuilds the pool from CSVs even if JSON exists
+                 (only CSVs that changed since the last rebuild are rescanned)
         test_mode: if True, uses a separate test pool file
+        pool_file: pool snapshot to use instead of the default for the mode
+        read_only: never write anything (pool, journal, fingerprints), e.g. for dry runs;
+                   changes only happen in memory
         """
         self.id_col = id_col
         self.title_col = title_col
         self.csv_keys = list(csv_datasets.keys())
-        self.pool_file = TEST_POOL_FILE if test_mode else DEFAULT_POOL_FILE
+        self.pool_file = Path(pool_file) if pool_file else TEST_POOL_FILE if test_mode else DEFAULT_POOL_FILE
+        self.read_only = read_only
 
-        # Ensure the folder exists
-        self.pool_file.parent.mkdir(parents=True, exist_ok=True)
+        # Changes are appended to a journal and folded into the snapshot by compact()
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_records = 0
+        self._compactor = None
 
         # Rebuild or load
-        if not rebuild and self.pool_file.exists():
-            with self.pool_file.open("r", encoding="utf-8") as f:
-                self.pool = json.load(f)
+        if not rebuild and (self.pool_file.exists() or journal_path_for(self.pool_file).exists()):
+            self.pool = load_pool_file(self.pool_file)
         else:
-            self.pool = self._build_pool(csv_datasets)
+            self.pool = {name: deque(ids) for name, ids in self._build_pool(csv_datasets).items()}
             self._save()
 
     def _build_pool(self, datasets: dict[str, pd.DataFrame]) -> dict[str, list[str]]:
-        pool = {}
-        for name, df in datasets.items():
-            # Determine which identifier column exists
-            id_column_candidates = [self.id_col, "dcextended:identifier"]
-            id_col_in_df = next((col for col in id_column_candidates if col in df.columns), None)
-
-            if id_col_in_df:
-                # Keep only rows where ID is not empty
-                df_valid = df[df[id_col_in_df].notna()]
+        """Available IDs per dataset; CSVs unchanged since the last rebuild are not rescanned."""
+        previous = self._load_fingerprints()
+        fingerprints = {name: self._build_entry(name, df, previous.get(name)) for name, df in datasets.items()}
+        if self.read_only:
+            return {name: entry["available"] for name, entry in fingerprints.items()}
+        self.pool_file.parent.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(fingerprints_path_for(self.pool_file), fingerprints)
+        return {name: entry["available"] for name, entry in fingerprints.items()}
 
-                # Columns to check for emptiness (exclude ID and file[mediasource])
-                ignore_cols = {id_col_in_df, "file[mediasource]"}
-                other_cols = [col for col in df_valid.columns if col not in ignore_cols]
+    def _load_fingerprints(self) -> dict:
+        try:
+            with fingerprints_path_for(self.pool_file).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
 
-                # Keep rows where all other columns are empty
-                mask_empty = df_valid[other_cols].isna().all(axis=1)
-                available_ids = df_valid.loc[mask_empty, id_col_in_df].astype(str).tolist()
+    def _build_entry(self, name: str, df: pd.DataFrame, previous: dict | None) -> dict:
+        """
+        Available IDs of one dataset plus the fingerprint that lets the next rebuild skip it.
+        A CSV whose path, size, mtime and shape match the last rebuild (or, for a dataset loaded
+        from the SQLite catalog, whose catalog version and shape match) is reused as is; any
+        other dataset is rescanned in full (one vectorized pass, about as cheap as hashing it).
+        """
+        source = df.attrs.get("file_path")
+        catalog_version = df.attrs.get("catalog_version")
+        stat = None
+        if catalog_version is None:
+            try:
+                stat = os.stat(source) if source else None
+            except OSError:
+                stat = None
+        entry = {
+            "file": source,
+            "size": stat.st_size if stat else None,
+            "mtime_ns": stat.st_mtime_ns if stat else None,
+            "catalog_version": catalog_version,
+            "columns": [str(col) for col in df.columns],
+            "rows": len(df),
+        }
+        known = stat is not None or catalog_version is not None
+        if (previous is not None and known and "available" in previous
+                and all(previous.get(key) == value for key, value in entry.items())):
+            return previous
 
-                pool[name] = available_ids
-            else:
-                pool[name] = []
+        # Determine which identifier column exists
+        id_column_candidates = [self.id_col, "dcextended:identifier"]
+        id_col_in_df = next((col for col in id_column_candidates if col in df.columns), None)
+        if id_col_in_df is None:
+            return {**entry, "available": []}
 
-        return pool
+        # Rows with an ID where every other column (except file[mediasource]) is empty
+        ignore_cols = {id_col_in_df, "file[mediasource]"}
+        other_cols = [col for col in df.columns if col not in ignore_cols]
+        empty = df[id_col_in_df].notna() & df[other_cols].isna().all(axis=1)
+        print(f"Identifier pool: rescanned {Path(source or name).name} ({len(df)} rows)")
+        return {**entry, "available": df.loc[empty, id_col_in_df].astype(str).tolist()}
 
     def get_available_ids(self, csv_name: str) -> list[str]:
-        return self.pool.get(csv_name, [])
+        return list(self.pool.get(csv_name, []))
 
     def pop_identifier(self, csv_name: str) -> str | None:
-        ids = self.pool.get(csv_name)
-        if ids:
-            identifier = ids.pop(0)
-            self._save()
-            return identifier
+        with self._lock:
+            ids = self.pool.get(csv_name)
+            if ids:
+                identifier = ids.popleft()
+                self._append_journal({"op": "pop", "csv": csv_name, "id": identifier})
+                return identifier
         return None
 
+    def reserve_many(self, csv_name: str, n: int) -> list[str]:
+        """Claim up to n IDs from the front of a pool in one step (fewer if the pool runs short)."""
+        with self._lock:
+            ids = self.pool.get(csv_name)
+            if not ids or n <= 0:
+                return []
+            reserved = [ids.popleft() for _ in range(min(n, len(ids)))]
+            self._append_journal({"op": "reserve", "csv": csv_name, "ids": reserved})
+            return reserved
+
+    def release_identifiers(self, csv_name: str, identifiers: list[str]):
+        """Return unused reserved IDs to the front of the pool, in their original order."""
+        if not identifiers:
+            return
+        with self._lock:
+            ids = self.pool.setdefault(csv_name, deque())
+            ids.extendleft(reversed(identifiers))
+            self._append_journal({"op": "release", "csv": csv_name, "ids": list(identifiers)})
+
     def add_identifier(self, csv_name: str, identifier: str):
-        if csv_name not in self.pool:
-            self.pool[csv_name] = []
-        self.pool[csv_name].append(identifier)
-        self._save()
+        with self._lock:
+            if csv_name not in self.pool:
+                self.pool[csv_name] = deque()
+            self.pool[csv_name].append(identifier)
+            self._append_journal({"op": "add", "csv": csv_name, "id": identifier})
 
-    def _save(self):
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    @property
+    def journal_file(self) -> Path:
+        return journal_path_for(self.pool_file)
+
+    def _append_journal(self, record: dict):
+        """Durably append one change; compacts in the background once the journal grows."""
+        if self.read_only:
+            return
+        if self._journal is None:
+            self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = self.journal_file.open("a", encoding="utf-8")
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+        self._journal_records += 1
+        if self._journal_records >= COMPACT_EVERY and not (self._compactor and self._compactor.is_alive()):
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and keep only records written since."""
+        if self.read_only:
+            return
+        with self._lock:
+            snapshot = {name: list(ids) for name, ids in self.pool.items()}
+            if self._journal is not None:
+                self._journal.flush()
+            offset = self.journal_file.stat().st_size if self.journal_file.exists() else 0
+
+        # The (slow) snapshot write happens without holding the lock
         self.pool_file.parent.mkdir(parents=True, exist_ok=True)
-        with self.pool_file.open("w", encoding="utf-8") as f:
-            json.dump(self.pool, f, indent=2)
+        _write_json_atomic(self.pool_file, snapshot)
+
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.journal_file.exists():
+                with self.journal_file.open("rb") as f:
+                    f.seek(offset)
+                    tail = f.read()
+                if tail:
+                    tmp_path = self.journal_file.with_name(self.journal_file.name + ".tmp")
+                    tmp_path.write_bytes(tail)
+                    os.replace(tmp_path, self.journal_file)
+                else:
+                    self.journal_file.unlink()
+                self._journal_records = tail.count(b"\n")
+
+    def close(self):
+        """Wait for any background compaction, then compact what is left."""
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact()
+
+    def _save(self):
+        """Write the full pool as a snapshot (and drop the journal it supersedes)."""
+        if self.read_only:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self.pool_file.parent.mkdir(parents=True, exist_ok=True)
+            _write_json_atomic(self.pool_file, {name: list(ids) for name, ids in self.pool.items()})
+            if self.journal_file.exists():
+                self.journal_file.unlink()
+            self._journal_records = 0
 
     def summary(self):
         for csv_name, ids in self.pool.items():
@@ -104,10 +313,9 @@ def display_identifier_pools() -> str:
     """Return a formatted string showing the full contents of both normal and test identifier pools."""
     pools = []
     for label, pool_file in [("Main Pool", DEFAULT_POOL_FILE), ("Test Pool", TEST_POOL_FILE)]:
-        if pool_file.exists():
+        if pool_file.exists() or journal_path_for(pool_file).exists():
             try:
-                with pool_file.open("r", encoding="utf-8") as f:
-                    pool_data = json.load(f)
+                pool_data = load_pool_file(pool_file)
                 summary_lines = [f"=== {label} ({pool_file.name}) ==="]
                 for name, ids in pool_data.items():
                     summary_lines.append(f"\n{name}: {len(ids)} IDs available")
@@ -0,0 +1,154 @@
+# utils/image_adjust.py
+"""
+Photo cleaning adjustments (brightness, contrast, denoise, rotation).
+
+Brightness and contrast are fused into one 256-entry lookup table that reproduces
+ImageEnhance exactly (contrast blends towards the mean grey of the brightened image,
+taken from its luma histogram), so the photo is remapped in a single pass. Work is done
+in row strips written straight into the output image, so peak memory is the result plus
+one strip instead of a full intermediate image per step. Denoise is either the exact
+median (PIL's MedianFilter, strip by strip) or a much faster separable median (rows,
+then columns).
+"""
+import numpy as np
+from PIL import Image, ImageFilter
+
+STRIP_BYTES = 8 * 1024 * 1024
+MIN_STRIP_ROWS = 16
+DENOISE_METHODS = ("median", "separable")
+
+
+def get_median_filter_size(denoise_factor: float) -> int:
+    """Map denoise factor (0-1) to odd integer size for MedianFilter (1–9)."""
+    size = max(1, min(9, int(denoise_factor * 9) | 1))  # Ensure odd number
+    return size
+
+
+def _strips(img: Image.Image):
+    """(start, stop) row ranges of about STRIP_BYTES of RGB pixels each."""
+    rows = max(MIN_STRIP_ROWS, STRIP_BYTES // max(1, img.width * 3))
+    for start in range(0, img.height, rows):
+        yield start, min(img.height, start + rows)
+
+
+def _rows(img: Image.Image, start: int, stop: int) -> np.ndarray:
+    return np.asarray(img.crop((0, start, img.width, stop)))
+
+
+# -----------------------------
+# BRIGHTNESS + CONTRAST
+# -----------------------------
+_IDENTITY = np.arange(256, dtype=np.uint8)
+
+
+def _blend_lut(base: float, alpha: float) -> np.ndarray:
+    """Image.blend(solid(base), image, alpha) as a LUT, with PIL's float32 maths and truncation."""
+    values = np.arange(256, dtype=np.float32)
+    base = np.float32(base)
+    blended = base + np.float32(alpha) * (values - base)
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+
+def _luma_histogram(img: Image.Image, lut: np.ndarray) -> np.ndarray:
+    """Histogram of convert("L") of an RGB image with lut applied, computed strip by strip."""
+    histogram = np.zeros(256, dtype=np.int64)
+    weights = (19595, 38470, 7471)  # PIL's fixed-point ITU-R 601-2 luma
+    for start, stop in _strips(img):
+        strip = _rows(img, start, stop)
+        luma = np.full(strip.shape[:2], 0x8000, dtype=np.uint32)
+        for channel, weight in enumerate(weights):
+            luma += lut[strip[..., channel]].astype(np.uint32) * weight
+        histogram += np.bincount((luma >> 16).ravel(), minlength=256)
+    return histogram
+
+
+def brightness_contrast_lut(img: Image.Image, brightness: float = 1.0, contrast: float = 1.0) -> np.ndarray:
+    """One LUT equal to ImageEnhance.Brightness(brightness) followed by ImageEnhance.Contrast(contrast)."""
+    lut = _blend_lut(0, brightness) if brightness != 1.0 else _IDENTITY
+    if contrast == 1.0:
+        return lut
+    histogram = _luma_histogram(img, lut)
+    pixels = histogram.sum()
+    mean = int(float(np.dot(histogram, np.arange(256))) / pixels + 0.5) if pixels else 0
+    return _blend_lut(mean, contrast)[lut]
+
+
+# -----------------------------
+# DENOISE
+# -----------------------------
+def _median_of(values: list[np.ndarray]) -> np.ndarray:
+    """Element-wise median of an odd number of equally shaped arrays (odd-even transposition sort)."""
+    values = list(values)
+    n = len(values)
+    for round_ in range(n):
+        for i in range(round_ % 2, n - 1, 2):
+            low = np.minimum(values[i], values[i + 1])
+            values[i + 1] = np.maximum(values[i], values[i + 1])
+            values[i] = low
+    return values[n // 2]
+
+
+def _separable_median(block: np.ndarray, size: int) -> np.ndarray:
+    """Median along rows, then along columns (edges replicated, like PIL)."""
+    r = size // 2
+    padded = np.pad(block, ((0, 0), (r, r), (0, 0)), mode="edge")
+    width = block.shape[1]
+    rows = _median_of([padded[:, i:i + width] for i in range(size)])
+
+    padded = np.pad(rows, ((r, r), (0, 0), (0, 0)), mode="edge")
+    height = block.shape[0]
+    return _median_of([padded[i:i + height] for i in range(size)])
+
+
+def _exact_median(block: np.ndarray, size: int) -> np.ndarray:
+    return np.asarray(Image.fromarray(block).filter(ImageFilter.MedianFilter(size=size)))
+
+
+def median_filter(block: np.ndarray, size: int, method: str = "median") -> np.ndarray:
+    """Median-filter an RGB array with the exact ("median") or fast ("separable") method."""
+    if method not in DENOISE_METHODS:
+        raise ValueError(f"Unknown denoise method '{method}', expected one of {DENOISE_METHODS}")
+    return _exact_median(block, size) if method == "median" else _separable_median(block, size)
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+def apply_adjustments(img: Image.Image, brightness: float = 1.0, contrast: float = 1.0,
+                      denoise: float = 0.0, rotation: int = 0, scale: float = 1.0,
+                      denoise_method: str = "median") -> Image.Image:
+    """
+    Apply the cleaning settings to an image and return the RGB result.
+    scale: size of img relative to the full photo; the median filter shrinks with it so a
+    low-resolution proxy previews the same amount of smoothing as the final image gets
+    (but never below 3 when the final image is filtered, or a small proxy would show none).
+    """
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    lut = brightness_contrast_lut(img, brightness, contrast)
+    size = 1
+    if denoise > 0:
+        size = get_median_filter_size(denoise)
+        if scale < 1.0 and size > 1:
+            size = max(3, int(round((size - 1) * scale)) | 1)
+
+    if lut is _IDENTITY and size == 1:
+        result = img.copy()
+    else:
+        # Each strip is read with size // 2 extra rows on either side, so the median sees the
+        # same neighbours as it would on the whole image
+        result = Image.new("RGB", img.size)
+        halo = size // 2
+        for start, stop in _strips(img):
+            top, bottom = max(0, start - halo), min(img.height, stop + halo)
+            block = _rows(img, top, bottom)
+            if lut is not _IDENTITY:
+                block = lut[block]
+            if size > 1:
+                block = median_filter(block, size, denoise_method)
+            result.paste(Image.fromarray(block[start - top:stop - top]), (0, start))
+
+    if rotation != 0:
+        result = result.rotate(rotation, expand=True)
+    return result
@@ -15,6 +15,11 @@ PHOTOS_RENAMED_DIR = PHOTOS_DIR / "renamed"
 PHOTOS_TEST_ORIGINAL_DIR = PHOTOS_DIR / "test_original"
 PHOTOS_TEST_RENAMED_DIR = PHOTOS_DIR / "test_renamed"
 
+CACHE_DIR = DOCS_BASE / "cache"
+THUMBNAIL_CACHE_DIR = CACHE_DIR / "thumbnails"
+DERIVATIVE_CACHE_DIR = CACHE_DIR / "derivatives"
+DATASET_CACHE_DIR = CACHE_DIR / "datasets"
+
 
 def ensure_all_dirs():
     """Create all required directories if missing."""
@@ -26,6 +31,9 @@ def ensure_all_dirs():
         PHOTOS_RENAMED_DIR,
         PHOTOS_TEST_ORIGINAL_DIR,
         PHOTOS_TEST_RENAMED_DIR,
+        THUMBNAIL_CACHE_DIR,
+        DERIVATIVE_CACHE_DIR,
+        DATASET_CACHE_DIR,
     ]
     for folder in folders:
         folder.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,284 @@
+# utils/perceptual_hash.py
+"""
+Near-duplicate photo detection with perceptual hashes.
+
+Each photo gets a 64-bit dHash and pHash, both from a single decode, cached in a JSON
+index keyed by path (and invalidated by size/mtime). pHash matches within a Hamming
+distance are found with a BK-tree, so a batch is compared against the collection
+without all-pairs checks, and each match is confirmed by its dHash distance.
+Renames done by utils/rename_engine.py carry a photo's entry over to its new path.
+
+Run from the app/ folder:
+    python -m utils.perceptual_hash [--test] [--distance 6]
+"""
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from utils.paths import (
+    DATA_DIR,
+    DATA_TEST_DIR,
+    PHOTOS_ORIGINAL_DIR,
+    PHOTOS_RENAMED_DIR,
+    PHOTOS_TEST_ORIGINAL_DIR,
+    PHOTOS_TEST_RENAMED_DIR,
+)
+
+DEFAULT_MAX_DISTANCE = 6
+DEFAULT_DHASH_DISTANCE = 10  # dHash reacts more to small edits, so its confirmation is looser
+HASH_WORKERS = 4
+
+
+def get_hash_index_path(test_mode: bool = False) -> Path:
+    return (DATA_TEST_DIR if test_mode else DATA_DIR) / "phash_index.json"
+
+
+# -----------------------------
+# HASHES
+# -----------------------------
+def _load_gray(path: Path) -> Image.Image:
+    """Decode a photo once, as grayscale and at reduced scale where the format allows it (JPEG)."""
+    with Image.open(path) as img:
+        img.draft("L", (128, 128))  # no-op for other formats
+        return img.convert("L")
+
+
+def _pixels(gray: Image.Image, size: tuple[int, int]) -> np.ndarray:
+    return np.asarray(gray.resize(size, Image.Resampling.LANCZOS), dtype=np.float64)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if b else "0" for b in bits.flatten()), 2)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _dhash_of(gray: Image.Image, hash_size: int = 8) -> int:
+    pixels = _pixels(gray, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _phash_of(gray: Image.Image, hash_size: int = 8) -> int:
+    dct = _DCT_32 @ _pixels(gray, (32, 32)) @ _DCT_32.T
+    low = dct[:hash_size, :hash_size]
+    return _bits_to_int(low > np.median(low.flatten()[1:]))
+
+
+def dhash(path: Path, hash_size: int = 8) -> int:
+    """Difference hash: is each pixel brighter than its right-hand neighbour?"""
+    return _dhash_of(_load_gray(path), hash_size)
+
+
+def phash(path: Path, hash_size: int = 8) -> int:
+    """DCT hash: low-frequency coefficients compared to their median (robust to resizing)."""
+    return _phash_of(_load_gray(path), hash_size)
+
+
+def image_hashes(path: Path) -> tuple[int, int]:
+    """(dHash, pHash) of a photo from a single decode."""
+    gray = _load_gray(path)
+    return _dhash_of(gray), _phash_of(gray)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# -----------------------------
+# BK-TREE
+# -----------------------------
+class BKTree:
+    def __init__(self):
+        """Metric tree over Hamming distance: search only visits subtrees that can hold a match."""
+        self.root = None  # (hash, [items], {distance: child})
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item], {})
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> list[tuple[int, object]]:
+        """Return (distance, item) for everything within max_distance of value."""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(results, key=lambda r: r[0])
+
+
+# -----------------------------
+# PERSISTENT INDEX
+# -----------------------------
+class PerceptualHashIndex:
+    def __init__(self, index_file: Path):
+        self.index_file = Path(index_file)
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        if self.index_file.exists():
+            try:
+                with self.index_file.open("r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                self.entries = {}
+
+    def _hash_file(self, path: Path, stat) -> dict | None:
+        try:
+            d, p = image_hashes(path)
+            return {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "dhash": f"{d:016x}",
+                "phash": f"{p:016x}",
+            }
+        except Exception as e:
+            print(f"Could not hash {path.name}: {e}")
+            return None
+
+    def update(self, paths) -> dict[Path, dict]:
+        """Hash any new or changed files (in parallel) and return {path: entry} for all of them."""
+        results, to_hash = {}, []
+        for path in map(Path, paths):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entry = self.entries.get(str(path))
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                results[path] = entry
+            else:
+                to_hash.append((path, stat))
+
+        if to_hash:
+            print(f"Hashing {len(to_hash)} new or changed photos ...")
+            with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+                for (path, _), entry in zip(to_hash, pool.map(lambda args: self._hash_file(*args), to_hash)):
+                    if entry is not None:
+                        with self._lock:
+                            self.entries[str(path)] = entry
+                        results[path] = entry
+        return results
+
+    def record_move(self, src: Path, dst: Path):
+        """Carry a moved photo's hashes over to its new path (its size and mtime are unchanged)."""
+        with self._lock:
+            entry = self.entries.pop(str(src), None) or self.entries.pop(str(Path(src).resolve()), None)
+            if entry is not None:
+                self.entries[str(Path(dst).resolve())] = entry
+
+    def prune(self):
+        """Forget files that no longer exist."""
+        with self._lock:
+            self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+
+    def save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_name(self.index_file.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_file)
+
+
+# -----------------------------
+# Shared indexes
+# -----------------------------
+_indexes: dict[Path, PerceptualHashIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_hash_index(test_mode: bool = False) -> PerceptualHashIndex:
+    """Return the shared index for the data folder (loaded on first use)."""
+    index_file = get_hash_index_path(test_mode)
+    with _indexes_lock:
+        if index_file not in _indexes:
+            _indexes[index_file] = PerceptualHashIndex(index_file)
+        return _indexes[index_file]
+
+
+def record_move(src: Path, dst: Path):
+    """Keep any loaded hash index current after a move/rename, so the photo isn't hashed again."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.record_move(src, dst)
+
+
+def find_near_duplicates(candidates, existing, index: PerceptualHashIndex,
+                         max_distance: int = DEFAULT_MAX_DISTANCE, same_group=None,
+                         dhash_distance: int = DEFAULT_DHASH_DISTANCE) -> list[tuple[Path, Path, int]]:
+    """
+    Compare each candidate photo against the existing photos and the candidates before it.
+    Returns (duplicate, original, pHash distance) pairs; each duplicate is reported once, against its
+    closest match whose dHash is also within dhash_distance.
+    same_group(a, b): optional predicate for pairs that should never count (e.g. variants of one photo).
+    """
+    candidates, existing = list(map(Path, candidates)), list(map(Path, existing))
+    hashes = index.update(existing + candidates)
+
+    tree = BKTree()
+    for path in existing:
+        if path in hashes:
+            tree.add(int(hashes[path]["phash"], 16), path)
+
+    duplicates = []
+    for path in candidates:
+        if path not in hashes:
+            continue
+        value = int(hashes[path]["phash"], 16)
+        d_value = int(hashes[path]["dhash"], 16)
+        for distance, match in tree.search(value, max_distance):
+            if hamming(d_value, int(hashes[match]["dhash"], 16)) > dhash_distance:
+                continue
+            if same_group is None or not same_group(path, match):
+                duplicates.append((path, match, distance))
+                break
+        tree.add(value, path)
+    return duplicates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate photos")
+    parser.add_argument("--test", action="store_true", help="Use test directories")
+    parser.add_argument("--distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Maximum Hamming distance")
+    args = parser.parse_args()
+
+    original_dir = PHOTOS_TEST_ORIGINAL_DIR if args.test else PHOTOS_ORIGINAL_DIR
+    renamed_dir = PHOTOS_TEST_RENAMED_DIR if args.test else PHOTOS_RENAMED_DIR
+
+    index = PerceptualHashIndex(get_hash_index_path(args.test))
+    pairs = find_near_duplicates(sorted(original_dir.glob("*.*")), sorted(renamed_dir.glob("*.*")),
+                                 index, max_distance=args.distance)
+    index.prune()
+    index.save()
+
+    for duplicate, original, distance in pairs:
+        print(f"{duplicate.name} ≈ {original.name} (distance {distance})")
+    print(f"{len(pairs)} near-duplicate photos found.")
@@ -0,0 +1,126 @@
+# utils/photo_index.py
+import os
+import threading
+from pathlib import Path
+
+
+def _stem_of(name: str) -> str | None:
+    """Key a file by its stem, e.g. "ABC00001_A" for ABC00001_A.jpg and "1990.12.3" for 1990.12.3.jpg."""
+    stem = Path(name).stem
+    return stem if stem and stem != name else None
+
+
+def _prefix_of(name: str) -> str | None:
+    """Everything before the first dot, which glob(f"{id}.*") also matched (e.g. ABC00001.orig.jpg)."""
+    prefix, dot, _ = name.partition(".")
+    return prefix if dot and prefix else None
+
+
+class PhotoIndex:
+    def __init__(self, directory: Path):
+        """
+        Map photo stem (e.g. "ABC00001" or "ABC00001_A") to its file in one directory.
+        A name with no file of that exact stem falls back to files named "<name>.<anything>.<ext>".
+        Built with a single os.scandir pass and rebuilt whenever the directory's mtime changes.
+        """
+        self.directory = Path(directory)
+        self._lock = threading.RLock()
+        self._by_stem: dict[str, Path] = {}
+        self._by_prefix: dict[str, Path] = {}
+        self._mtime_ns = None
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Rescan the directory."""
+        with self._lock:
+            mtime = self._dir_mtime()
+            by_stem, by_prefix = {}, {}
+            if mtime is not None:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        stem = _stem_of(entry.name)
+                        if not stem or not entry.is_file():
+                            continue
+                        by_stem.setdefault(stem, Path(entry.path))
+                        prefix = _prefix_of(entry.name)
+                        if prefix != stem:
+                            by_prefix.setdefault(prefix, Path(entry.path))
+            self._by_stem, self._by_prefix = by_stem, by_prefix
+            self._mtime_ns = mtime
+
+    def _ensure_fresh(self):
+        if self._mtime_ns is None or self._dir_mtime() != self._mtime_ns:
+            self.refresh()
+
+    def get(self, stem: str) -> Path | None:
+        with self._lock:
+            self._ensure_fresh()
+            stem = str(stem)
+            return self._by_stem.get(stem) or self._by_prefix.get(stem)
+
+    def __contains__(self, stem) -> bool:
+        return self.get(stem) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._by_stem)
+
+    def paths(self) -> list[Path]:
+        with self._lock:
+            self._ensure_fresh()
+            return list(self._by_stem.values())
+
+    def _record(self, added: Path | None = None, removed: Path | None = None):
+        """Apply a change we made ourselves, then accept the directory's new mtime as current."""
+        with self._lock:
+            if self._mtime_ns is None:
+                return  # not built yet; the first lookup will scan anyway
+            if removed is not None:
+                for keys, key in ((self._by_stem, _stem_of(removed.name)), (self._by_prefix, _prefix_of(removed.name))):
+                    if key and keys.get(key) == removed:
+                        del keys[key]
+            if added is not None:
+                stem = _stem_of(added.name)
+                if stem:
+                    self._by_stem[stem] = added
+                    prefix = _prefix_of(added.name)
+                    if prefix != stem:
+                        self._by_prefix[prefix] = added
+            self._mtime_ns = self._dir_mtime()
+
+
+# -----------------------------
+# Shared indexes
+# -----------------------------
+_indexes: dict[Path, PhotoIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_photo_index(directory: Path) -> PhotoIndex:
+    """Return the shared index for a directory (created on first use)."""
+    key = Path(directory).resolve()
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = PhotoIndex(key)
+        return _indexes[key]
+
+
+def record_move(src: Path, dst: Path):
+    """Keep any shared indexes for the source and destination folders current after a move/rename."""
+    src, dst = Path(src).resolve(), Path(dst).resolve()
+    with _indexes_lock:
+        src_index = _indexes.get(src.parent)
+        dst_index = _indexes.get(dst.parent)
+    if src_index is dst_index and src_index is not None:
+        src_index._record(added=dst, removed=src)
+        return
+    if src_index is not None:
+        src_index._record(removed=src)
+    if dst_index is not None:
+        dst_index._record(added=dst)
@@ -1,22 +1,81 @@
 from collections import defaultdict
 import re
-import shutil
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from utils.rename_engine import DEFAULT_MOVE_WORKERS, describe_moves, execute_moves, rollback_moves
 
-def group_and_rename_variants(photo_files, id_pool, pool_choice, df, renamed_dir, set_temporal=False, temporal_value=None):
+def build_id_index(df: pd.DataFrame, id_col: str = "ID") -> dict:
+    """Map each ID to the position of its first row, so lookups are O(1) instead of a column scan."""
+    index = {}
+    for pos, value in enumerate(df[id_col].tolist()):
+        index.setdefault(value, pos)
+    return index
+
+def apply_row_plan(df, row_plan, set_temporal=False, temporal_value=None):
     """
-    Groups photos by base name and renames them using shared base identifiers.
-    Variants like _A, _a, _B, _b are treated case-insensitively but normalized to uppercase suffix.
-    Updates CSV by duplicating rows for suffix variants immediately below the base row.
+    Apply a rename plan to the CSV in one pass and return the new DataFrame.
+
+    row_plan: list of {"base_id", "title", "variants": [{"id", "title"}, ...]}
+    Base rows get their Title (and Temporal Coverage). Each variant becomes a copy of its
+    base row inserted directly below it, in plan order — the same layout as inserting them one by one.
     """
-    # --- Ensure renamed_dir exists in Documents ---
-    renamed_dir.mkdir(parents=True, exist_ok=True)
+    df = df.reset_index(drop=True)
+    id_index = build_id_index(df)
+    has_title = "Title" in df.columns
+    has_temporal = set_temporal and "Temporal Coverage" in df.columns
+
+    base_positions, base_titles = [], []
+    variant_sources, variant_ids, variant_titles = [], [], []
+    for entry in row_plan:
+        pos = id_index.get(entry["base_id"])
+        if pos is None:
+            continue
+        base_positions.append(pos)
+        base_titles.append(entry["title"])
+        for variant in entry["variants"]:
+            if variant["id"] in id_index:
+                continue  # already applied (e.g. resuming after the CSV was saved)
+            variant_sources.append(pos)
+            variant_ids.append(variant["id"])
+            variant_titles.append(variant["title"])
+
+    # Empty columns are read back as float64; make room for text before assigning it
+    for column, needed in (("Title", has_title), ("Temporal Coverage", has_temporal)):
+        if needed and base_positions and df[column].dtype != object:
+            df[column] = df[column].astype(object)
+
+    if base_positions:
+        if has_title:
+            df.loc[base_positions, "Title"] = base_titles
+        if has_temporal:
+            df.loc[base_positions, "Temporal Coverage"] = temporal_value
 
+    if not variant_sources:
+        return df
+
+    # Variants start as copies of their (already updated) base rows
+    variants = df.iloc[variant_sources].copy()
+    variants["ID"] = variant_ids
+    if has_title:
+        variants["Title"] = variant_titles
+    if has_temporal:
+        variants["Temporal Coverage"] = temporal_value
+
+    # Stable sort on "row this belongs under": originals come first, then their variants in plan order
+    combined = pd.concat([df, variants], ignore_index=True)
+    anchor = np.concatenate([np.arange(len(df)), np.asarray(variant_sources)])
+    order = np.argsort(anchor, kind="stable")
+    return combined.iloc[order].reset_index(drop=True)
+
+def group_photos(photo_files) -> dict[str, list[tuple[str, Path]]]:
+    """
+    Group photos by base name. Variants like _A, _a, _B, _b are treated case-insensitively
+    but normalized to uppercase suffix; each group lists the base photo first.
+    """
     pattern = re.compile(r"^(.*?)(?:_([a-zA-Z]))?$")
     photo_groups = defaultdict(list)
 
-    # Group photos by base name
     for photo_path in photo_files:
         stem = photo_path.stem
         match = pattern.match(stem)
@@ -26,60 +85,114 @@ def group_and_rename_variants(photo_files, id_pool, pool_choice, df, renamed_dir
         suffix = suffix.upper() if suffix else ''  # Normalize suffix to uppercase
         photo_groups[base].append((suffix, photo_path))
 
-    total_renamed = 0
+    return {
+        base: sorted(photo_groups[base], key=lambda x: (x[0] != '', x[0]))
+        for base in sorted(photo_groups.keys())
+    }
 
-    for base in sorted(photo_groups.keys()):
-        group = sorted(photo_groups[base], key=lambda x: (x[0] != '', x[0]))
-
-        base_identifier = id_pool.pop_identifier(pool_choice)
-        if not base_identifier:
-            print(f"No more available IDs in pool '{pool_choice}'. Stopping.")
-            break
+def plan_renames(photo_groups, identifiers, df, renamed_dir) -> dict:
+    """
+    Work out every move and CSV change for a batch without touching disk.
+    Returns {"moves": [{"src", "dst", "id"}], "row_plan": [...], "used_ids": [...]}.
+    """
+    id_index = build_id_index(df)
+    moves, row_plan, used_ids = [], [], []
 
-        # Find index of base row in df
-        base_row_idx = df.index[df["ID"] == base_identifier]
-        if base_row_idx.empty:
-            print(f"Base ID '{base_identifier}' not found in CSV, skipping group {base}")
+    for base, identifier in zip(photo_groups, identifiers):
+        used_ids.append(identifier)
+        if identifier not in id_index:
+            print(f"Base ID '{identifier}' not found in CSV, skipping group {base}")
             continue
-        base_row_idx = base_row_idx[0]
-
-        # Rename base photo
-        suffix, photo_path = group[0]
-        ext = photo_path.suffix
-        new_filename = f"{base_identifier}{ext}"
-        new_path = renamed_dir / new_filename
-        shutil.move(str(photo_path), str(new_path))
-        print(f"{photo_path.name} → {new_filename}")
-
-        if "Title" in df.columns:
-            df.at[base_row_idx, "Title"] = photo_path.name
-        if set_temporal and "Temporal Coverage" in df.columns:
-            df.at[base_row_idx, "Temporal Coverage"] = temporal_value
-
-        total_renamed += 1
-
-        # Handle variant photos
-        insert_pos = base_row_idx + 1
-        for suffix, photo_path in group[1:]:
-            ext = photo_path.suffix
-            full_identifier = f"{base_identifier}_{suffix}"
-            new_filename = f"{full_identifier}{ext}"
-            new_path = renamed_dir / new_filename
-            shutil.move(str(photo_path), str(new_path))
-            print(f"{photo_path.name} → {new_filename}")
-
-            # Duplicate base row and update
-            base_row = df.loc[base_row_idx].copy()
-            base_row["ID"] = full_identifier
-            if "Title" in df.columns:
-                base_row["Title"] = photo_path.name
-            if set_temporal and "Temporal Coverage" in df.columns:
-                base_row["Temporal Coverage"] = temporal_value
-
-            top = df.iloc[:insert_pos]
-            bottom = df.iloc[insert_pos:]
-            df = pd.concat([top, base_row.to_frame().T, bottom]).reset_index(drop=True)
-            insert_pos += 1
-            total_renamed += 1
-
-    return df, total_renamed
+
+        group = photo_groups[base]
+        entry = {"base_id": identifier, "title": group[0][1].name, "variants": []}
+        # The first photo always takes the base ID, even if the group has no unsuffixed photo
+        for position, (suffix, photo_path) in enumerate(group):
+            full_identifier = f"{identifier}_{suffix}" if position else identifier
+            new_path = Path(renamed_dir) / f"{full_identifier}{photo_path.suffix}"
+            moves.append({"src": str(photo_path), "dst": str(new_path), "id": full_identifier})
+            if position:
+                entry["variants"].append({"id": full_identifier, "title": photo_path.name})
+        row_plan.append(entry)
+
+    return {"moves": moves, "row_plan": row_plan, "used_ids": used_ids}
+
+def group_and_rename_variants(photo_files, id_pool, pool_choice, df, renamed_dir, set_temporal=False, temporal_value=None,
+                              journal=None, dry_run=False, workers=DEFAULT_MOVE_WORKERS):
+    """
+    Groups photos by base name and renames them using shared base identifiers.
+    Variants like _A, _a, _B, _b are treated case-insensitively but normalized to uppercase suffix.
+    Updates CSV by duplicating rows for suffix variants immediately below the base row.
+
+    The whole batch is planned first, journaled (if a RenameJournal is given) and then moved on a
+    thread pool. With dry_run=True the plan is printed and nothing on disk changes.
+    """
+    photo_groups = group_photos(photo_files)
+
+    if dry_run:
+        identifiers = id_pool.get_available_ids(pool_choice)[:len(photo_groups)]
+        plan = plan_renames(photo_groups, identifiers, df, renamed_dir)
+        print(describe_moves(plan["moves"]))
+        df = apply_row_plan(df, plan["row_plan"], set_temporal=set_temporal, temporal_value=temporal_value)
+        return df, len(plan["moves"])
+
+    # --- Ensure renamed_dir exists in Documents ---
+    renamed_dir.mkdir(parents=True, exist_ok=True)
+
+    # Reserve one ID per photo group up front, before any file is moved
+    reserved_ids = id_pool.reserve_many(pool_choice, len(photo_groups))
+    if len(reserved_ids) < len(photo_groups):
+        print(f"No more available IDs in pool '{pool_choice}': "
+              f"{len(reserved_ids)} IDs for {len(photo_groups)} photo groups.")
+
+    try:
+        plan = plan_renames(photo_groups, reserved_ids, df, renamed_dir)
+        plan.update(pool_choice=pool_choice, set_temporal=set_temporal, temporal_value=temporal_value)
+        if journal is not None:
+            journal.start(plan)
+    except Exception:
+        id_pool.release_identifiers(pool_choice, reserved_ids)
+        raise
+
+    # A failure from here on leaves the journal behind so the batch can be resumed or rolled back
+    execute_moves(plan["moves"], journal=journal, workers=workers)
+
+    # Build the updated CSV in one pass instead of copying it once per variant
+    df = apply_row_plan(df, plan["row_plan"], set_temporal=set_temporal, temporal_value=temporal_value)
+
+    return df, len(plan["moves"])
+
+def recover_interrupted_batch(journal, id_pool, resume=True, catalog=None) -> Path | None:
+    """
+    Finish (resume=True) or undo (resume=False) a batch left behind in a rename journal.
+    Resuming completes the remaining moves and applies the CSV changes (to the catalog's copy
+    of the dataset if a catalog is given and holds it); rolling back moves files back to their
+    original names and returns the batch's IDs to the pool.
+    Returns the CSV path that was updated, if any.
+    """
+    plan, csv_path, done = journal.read()
+    pool_choice = plan["pool_choice"]
+
+    if not resume:
+        rollback_moves(plan["moves"])
+        id_pool.release_identifiers(pool_choice, plan["used_ids"])
+        journal.commit()
+        print(f"Rolled back interrupted batch ({len(plan['moves'])} planned moves).")
+        return None
+
+    execute_moves(plan["moves"], journal=journal, done=done, resuming=True)
+    if csv_path:
+        name = Path(csv_path).stem
+        in_catalog = catalog is not None and name in catalog.dataset_names()
+        df = catalog.get_dataframe(name) if in_catalog else pd.read_csv(csv_path)
+        df = apply_row_plan(df, plan["row_plan"],
+                            set_temporal=plan["set_temporal"], temporal_value=plan["temporal_value"])
+        if in_catalog:
+            catalog.import_dataframe(name, df, source_path=csv_path)
+            print(f"Updated dataset '{name}' saved to catalog")
+        else:
+            df.to_csv(csv_path, index=False)
+            print(f"Updated CSV saved: {csv_path}")
+    journal.commit()
+    print(f"Resumed interrupted batch ({len(plan['moves'])} moves).")
+    return Path(csv_path) if csv_path else None
@@ -0,0 +1,200 @@
+# utils/prefetch.py
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class PipelineStats:
+    def __init__(self):
+        """Thread-safe per-stage timings and queue-depth samples for a prefetch pipeline."""
+        self._lock = threading.Lock()
+        self.stage_totals: dict[str, float] = {}
+        self.stage_counts: dict[str, int] = {}
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+            self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def sample_depth(self, depth: int):
+        """Record how many prepared items were waiting when the consumer asked for the next one."""
+        with self._lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "wall_s": time.perf_counter() - self.started,
+                "stages": {
+                    stage: {"total_s": total, "count": self.stage_counts[stage]}
+                    for stage, total in self.stage_totals.items()
+                },
+                "queue_depth": {
+                    "avg": self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+                    "max": self.depth_max,
+                },
+            }
+
+
+def format_stats(stats: dict) -> str:
+    """Human-readable summary of PipelineStats.as_dict()."""
+    lines = [f"Pipeline wall time: {stats['wall_s']:.2f}s"]
+    for stage, info in stats["stages"].items():
+        avg_ms = info["total_s"] / info["count"] * 1000 if info["count"] else 0.0
+        lines.append(f"  {stage}: {info['total_s']:.2f}s total, {avg_ms:.1f} ms avg over {info['count']}")
+    depth = stats["queue_depth"]
+    lines.append(f"  queue depth: avg {depth['avg']:.1f}, max {depth['max']}")
+    return "\n".join(lines)
+
+
+class PrefetchPipeline:
+    def __init__(self, load_fn, workers: int = 2, max_pending: int = 16, stats: PipelineStats | None = None):
+        """
+        Bounded producer/consumer pipeline.
+
+        load_fn: called on a worker thread for each item (e.g. decode + preprocess an image)
+        workers: size of the loading thread pool
+        max_pending: most items loaded or loading ahead of the consumer at any time
+        """
+        self.load_fn = load_fn
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.stats = stats or PipelineStats()
+
+    def _timed_load(self, item):
+        with self.stats.timed("load"):
+            return self.load_fn(item)
+
+    def run(self, items):
+        """Yield (item, result, error) in input order while later items load in the background."""
+        items = iter(items)
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+
+        def fill():
+            while len(pending) < self.max_pending:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                pending.append((item, pool.submit(self._timed_load, item)))
+
+        try:
+            fill()
+            while pending:
+                self.stats.sample_depth(sum(future.done() for _, future in pending))
+                item, future = pending.popleft()
+
+                start = time.perf_counter()
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, str(e)
+                self.stats.record("wait", time.perf_counter() - start)
+
+                fill()
+                yield item, result, error
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+class WindowPrefetcher:
+    def __init__(self, load_fn, capacity: int = 32):
+        """
+        Background loader for the items around a cursor (e.g. neighbouring rows in a viewer).
+
+        load_fn: called on the worker thread for each key; its result is kept in a bounded LRU
+        capacity: most results held in memory
+        Results are only ever read on the caller's thread via get()/poll(), so a Tk view can
+        hand them to widgets from an after() callback.
+        """
+        self.load_fn = load_fn
+        self.capacity = max(1, capacity)
+        self._cache: OrderedDict = OrderedDict()
+        self._wanted: list = []
+        self._ready: deque = deque(maxlen=2 * self.capacity)  # bounded: nobody may be polling
+        self._cond = threading.Condition()
+        self._closed = False
+        self._generation = 0  # bumped by clear() so loads already in flight are dropped
+        self._thread = threading.Thread(target=self._worker, name="window-prefetch", daemon=True)
+        self._thread.start()
+
+    def request(self, keys):
+        """Replace the wanted window; keys are loaded in the order given (most urgent first)."""
+        with self._cond:
+            self._wanted = [k for k in dict.fromkeys(keys) if k not in self._cache]
+            self._cond.notify()
+
+    def get(self, key, default=None):
+        """Return a loaded result (marking it recently used), or default if it isn't ready."""
+        with self._cond:
+            if key not in self._cache:
+                return default
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def __contains__(self, key) -> bool:
+        with self._cond:
+            return key in self._cache
+
+    def poll(self) -> list:
+        """Keys that finished loading since the last poll (a hint: they may have been evicted since)."""
+        with self._cond:
+            ready = list(self._ready)
+            self._ready.clear()
+        return ready
+
+    def clear(self):
+        with self._cond:
+            self._cache.clear()
+            self._ready.clear()
+            self._wanted = []
+            self._generation += 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._wanted.pop(0)
+                if key in self._cache:
+                    continue
+                generation = self._generation
+
+            try:
+                result = self.load_fn(key)
+            except Exception as e:
+                print(f"⚠ Prefetch failed for {key}: {e}")
+                result = None
+
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.capacity:
+                    self._cache.popitem(last=False)
+                self._ready.append(key)
@@ -0,0 +1,98 @@
+# utils/record_duplicates.py
+"""
+Duplicate-record detection across every loaded CSV.
+
+The chosen columns are normalized (case, surrounding and repeated whitespace) with
+vectorized string operations, each row is hashed with pandas' hash_pandas_object, and
+duplicates are found with duplicated()/groupby on the hashes — no per-row Python loops.
+
+Run from the app/ folder:
+    python -m utils.record_duplicates [--test] [--columns Title Description]
+"""
+import argparse
+from itertools import islice
+import pandas as pd
+from utils.csv_loader import load_csvs_from_dir
+from utils.paths import DATA_DIR, DATA_TEST_DIR
+
+DEFAULT_DUPLICATE_COLUMNS = ("Title", "Description")
+
+
+def normalize_columns(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """Lower-cased, whitespace-collapsed text for each column; missing columns and NaN become ""."""
+    normalized = {}
+    for column in columns:
+        if column in df.columns:
+            values = df[column].astype("string").fillna("")
+            normalized[column] = values.str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
+        else:
+            normalized[column] = pd.Series("", index=df.index, dtype="string")
+    return pd.DataFrame(normalized, index=df.index)
+
+
+def find_duplicate_records(datasets: dict[str, pd.DataFrame], columns=DEFAULT_DUPLICATE_COLUMNS,
+                           id_col: str = "ID") -> pd.DataFrame:
+    """
+    Return one row per duplicated record, with columns "dataset", id_col, "group" and the chosen columns.
+    Rows that share a group have the same normalized values, within or across datasets.
+    Rows where every chosen column is empty are ignored.
+    """
+    columns = [c for c in columns if any(c in df.columns for df in datasets.values())]
+    result_columns = ["dataset", id_col, "group", *columns]
+    if not columns:
+        return pd.DataFrame(columns=result_columns)
+
+    frames = []
+    for name, df in datasets.items():
+        if not any(c in df.columns for c in columns):
+            continue
+        keys = normalize_columns(df, columns)
+        frame = pd.DataFrame({
+            "dataset": name,
+            id_col: df[id_col].to_numpy() if id_col in df.columns else pd.NA,
+        }, index=df.index)
+        frame[columns] = df.reindex(columns=columns).to_numpy()
+        frame[[f"_key_{c}" for c in columns]] = keys.to_numpy()
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=result_columns)
+
+    records = pd.concat(frames, ignore_index=True)
+    key_columns = [f"_key_{c}" for c in columns]
+    records = records[(records[key_columns] != "").any(axis=1)]
+
+    # Cheap 64-bit row hashes narrow the search; the exact keys then settle the groups
+    hashes = pd.util.hash_pandas_object(records[key_columns], index=False)
+    records = records[hashes.duplicated(keep=False).to_numpy()]
+    if records.empty:
+        return pd.DataFrame(columns=result_columns)
+
+    records = records[records.duplicated(key_columns, keep=False)]
+    records["group"] = records.groupby(key_columns, sort=False).ngroup()
+    return records.sort_values(["group", "dataset"], kind="stable")[result_columns].reset_index(drop=True)
+
+
+def format_record_duplicate_report(duplicates: pd.DataFrame, id_col: str = "ID", limit: int = 10) -> str:
+    if duplicates.empty:
+        return "No duplicate records found."
+    groups = duplicates.groupby("group", sort=True)
+    lines = [f"{len(duplicates)} records in {groups.ngroups} duplicate groups:"]
+    for _, group in islice(groups, limit):
+        members = ", ".join(f"{d}:{i}" for d, i in zip(group["dataset"], group[id_col]))
+        lines.append(f"  {members}")
+    if groups.ngroups > limit:
+        lines.append(f"  ... and {groups.ngroups - limit} more groups")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report duplicate records across CSVs")
+    parser.add_argument("--test", action="store_true", help="Use test data folder")
+    parser.add_argument("--columns", nargs="+", default=list(DEFAULT_DUPLICATE_COLUMNS),
+                        help="Columns that must match for two records to count as duplicates")
+    args = parser.parse_args()
+
+    # Only the columns being compared are parsed
+    datasets = load_csvs_from_dir(DATA_TEST_DIR if args.test else DATA_DIR,
+                                  columns=["ID", *args.columns], compact=True)
+    print(format_record_duplicate_report(find_duplicate_records(datasets, columns=args.columns), limit=50))
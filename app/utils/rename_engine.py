@@ -0,0 +1,163 @@
+# utils/rename_engine.py
+"""
+Plan-then-execute file moves with a crash-recovery journal.
+
+The journal is a JSON-lines file:
+    {"event": "plan", "plan": {...}, "csv_path": "..."}   written before anything moves
+    {"event": "moved", "step": 3}                          one per finished move
+It is deleted once the batch is committed (CSV saved), so a journal left on
+disk always means an interrupted batch that can be resumed or rolled back.
+"""
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from utils.photo_index import record_move
+from utils.perceptual_hash import record_move as record_hash_move
+
+DEFAULT_MOVE_WORKERS = 4
+
+
+class RenameError(RuntimeError):
+    pass
+
+
+class RenameJournal:
+    def __init__(self, path: Path, csv_path: Path | None = None):
+        self.path = Path(path)
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _write(self, record: dict):
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a", encoding="utf-8")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def start(self, plan: dict):
+        """Record the full plan before the first file is touched."""
+        if self.exists():
+            raise RenameError(f"An unfinished rename batch is still recorded in {self.path}")
+        self._write({"event": "plan", "plan": plan, "csv_path": str(self.csv_path) if self.csv_path else None})
+
+    def mark_moved(self, step: int):
+        self._write({"event": "moved", "step": step})
+
+    def read(self) -> tuple[dict, str | None, set[int]]:
+        """Return (plan, csv_path, finished step numbers) from an existing journal."""
+        plan, csv_path, done = None, None, set()
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line from a crash
+                if record["event"] == "plan":
+                    plan, csv_path = record["plan"], record.get("csv_path")
+                elif record["event"] == "moved":
+                    done.add(record["step"])
+        if plan is None:
+            raise RenameError(f"Rename journal has no plan: {self.path}")
+        return plan, csv_path, done
+
+    def commit(self):
+        """The batch is complete; forget it."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.path.exists():
+                self.path.unlink()
+
+
+def describe_moves(moves: list[dict]) -> str:
+    """Dry-run report of a list of {"src", "dst", "id"} moves."""
+    lines = [f"Planned moves ({len(moves)}):"]
+    lines += [f"  {Path(m['src']).name} → {Path(m['dst']).name}" for m in moves]
+    return "\n".join(lines)
+
+
+def _move(src: Path, dst: Path, resuming: bool = False):
+    """Move one file so that dst only ever appears complete, even across volumes."""
+    if dst.exists():
+        if not src.exists():
+            return  # already moved before a crash
+        if resuming and dst.stat().st_size == src.stat().st_size:
+            src.unlink()  # crashed after the copy landed but before the source was removed
+            record_move(src, dst)
+            record_hash_move(src, dst)
+            return
+        raise RenameError(f"Destination already exists: {dst}")
+
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # Different volume: copy under a temp name, then swap it in
+        tmp_path = dst.with_name(dst.name + ".partial")
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+        src.unlink()
+    record_move(src, dst)
+    record_hash_move(src, dst)
+
+
+def execute_moves(moves: list[dict], journal: RenameJournal | None = None,
+                  done: set[int] | frozenset = frozenset(), workers: int = DEFAULT_MOVE_WORKERS,
+                  resuming: bool = False):
+    """
+    Run every move not already in `done` on a thread pool, journaling each one.
+    Cross-volume moves are full copies, so running several at once hides most of the I/O wait.
+    resuming: the moves come from an interrupted batch, so any of them (journaled or not) may
+              have copied its file before the crash.
+    Raises RenameError listing failures after all other moves have finished.
+    """
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rename") as pool:
+        futures = {
+            pool.submit(_move, Path(move["src"]), Path(move["dst"]), resuming): step
+            for step, move in enumerate(moves)
+            if step not in done
+        }
+        for future in as_completed(futures):
+            step = futures[future]
+            move = moves[step]
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"{Path(move['src']).name}: {e}")
+                continue
+            if journal is not None:
+                journal.mark_moved(step)
+            print(f"{Path(move['src']).name} → {Path(move['dst']).name}")
+
+    if errors:
+        raise RenameError(f"{len(errors)} move(s) failed:\n" + "\n".join(errors))
+
+
+def rollback_moves(moves: list[dict]):
+    """
+    Move every step that reached its destination (journaled or not) back to where it came from.
+    A cross-volume copy that landed before the source was removed is deleted, as is any
+    half-written .partial copy, so no planned destination is left behind.
+    """
+    for move in moves:
+        src, dst = Path(move["src"]), Path(move["dst"])
+        tmp_path = dst.with_name(dst.name + ".partial")
+        if tmp_path.exists():
+            tmp_path.unlink()
+            print(f"Removed partial copy {tmp_path.name}")
+        if dst.exists() and not src.exists():
+            _move(dst, src)
+            print(f"Rolled back {dst.name} → {src.name}")
+        elif dst.exists() and dst.stat().st_size == src.stat().st_size:
+            dst.unlink()  # crashed after the copy landed but before the source was removed
+            print(f"Removed copied {dst.name}, {src.name} is still in place")
@@ -0,0 +1,114 @@
+# utils/thumbnail_cache.py
+"""
+On-disk thumbnail cache for the photo folders.
+
+Thumbnails are keyed by (path, size, mtime, requested box), so an edited photo never
+shows a stale preview. They are generated with Image.draft, which lets the JPEG decoder
+skip straight to a 1/2, 1/4 or 1/8 scale image instead of decoding a full scan.
+The cache is bounded by total bytes; the least recently used thumbnails are evicted first.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from PIL import Image
+from utils.paths import THUMBNAIL_CACHE_DIR
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+THUMBNAIL_QUALITY = 90
+
+
+def make_thumbnail(path: Path, box: tuple[int, int]) -> Image.Image:
+    """Decode a photo at reduced scale (JPEG) and shrink it to fit inside box."""
+    with Image.open(path) as img:
+        img.draft("RGB", box)  # no-op for formats without scaled decoding
+        img = img.convert("RGB")
+    img.thumbnail(box)
+    return img
+
+
+class ThumbnailCache:
+    quality = THUMBNAIL_QUALITY
+
+    def __init__(self, cache_dir: Path = THUMBNAIL_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # counted on first write
+
+    def _key(self, path: Path, stat: os.stat_result, box: tuple[int, int]) -> Path:
+        raw = f"{Path(path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{box[0]}x{box[1]}"
+        return self.cache_dir / f"{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.jpg"
+
+    def get(self, path: Path, box: tuple[int, int] = (400, 400)) -> Image.Image:
+        """Return the thumbnail for a photo, generating and storing it on a miss."""
+        cache_file = self._key(path, os.stat(path), box)
+        try:
+            with Image.open(cache_file) as cached:
+                cached.load()
+            os.utime(cache_file)  # mark as recently used
+            return cached
+        except (FileNotFoundError, OSError):
+            pass
+
+        thumb = make_thumbnail(path, box)
+        self._store(cache_file, thumb)
+        return thumb
+
+    def _store(self, cache_file: Path, thumb: Image.Image):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            thumb.save(tmp_path, "JPEG", quality=self.quality)
+            os.replace(tmp_path, cache_file)
+        except OSError as e:
+            print(f"⚠ Could not cache thumbnail for {cache_file.name}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += cache_file.stat().st_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(path, size, last used) for every cached thumbnail."""
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".jpg"):
+                    stat = entry.stat()
+                    yield Path(entry.path), stat.st_size, stat.st_mtime_ns
+
+    def _evict(self):
+        """Drop least recently used thumbnails until the cache is back under 90% of its budget."""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            if self.cache_dir.exists():
+                for path, _, _ in list(self._entries()):
+                    path.unlink(missing_ok=True)
+            self._total_bytes = 0
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the application-wide thumbnail cache."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ThumbnailCache()
+        return _shared_cache
@@ -0,0 +1,157 @@
+# id_navigator.py
+
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+import numpy as np
+
+NEW_MARKER = " ★ NEW"
+
+
+class IdNavigator(ttk.Frame):
+    def __init__(self, parent, on_select, visible_rows=8, width=30):
+        """
+        Searchable ID list that only ever holds the rows on screen.
+
+        Typing filters by ID prefix using a sorted index (two bisects, no scan);
+        on_select(row_idx) is called with the CSV row position of the chosen ID.
+        """
+        super().__init__(parent)
+        self.on_select = on_select
+        self.visible_rows = visible_rows
+
+        self.ids = []             # ID per CSV row
+        self.sorted_ids = []      # IDs in sorted order ...
+        self.sorted_rows = []     # ... and the CSV row each one came from
+        self.marked = set()
+        self.view = None          # None: all rows in CSV order; (lo, hi): a slice of the sorted index
+        self.top = 0
+        self.selected_row = None
+
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
+        search = ttk.Entry(self, textvariable=self.search_var, width=width)
+        search.pack(fill="x")
+        search.bind("<Return>", self.select_first_match)
+
+        body = ttk.Frame(self)
+        body.pack(fill="both", expand=True)
+        self.listbox = tk.Listbox(body, height=visible_rows, width=width, activestyle="none",
+                                  exportselection=False)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind("<<ListboxSelect>>", self.on_click)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_by(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_by(1))
+        self.listbox.bind("<Up>", lambda e: self.scroll_by(-1) or "break")
+        self.listbox.bind("<Down>", lambda e: self.scroll_by(1) or "break")
+
+    # -------------------------------------------------------------------
+    # Data
+    # -------------------------------------------------------------------
+    def set_ids(self, ids, marked=()):
+        """Load the IDs (one per CSV row) and build the sorted index."""
+        self.ids = [str(i) for i in ids]
+        order = np.argsort(np.array(self.ids, dtype=object), kind="stable")
+        self.sorted_ids = [self.ids[i] for i in order]
+        self.sorted_rows = order.tolist()
+        self.marked = set(marked)
+        self.selected_row = None
+        self.search_var.set("")
+        self.apply_search()
+
+    def find(self, image_id) -> int | None:
+        """CSV row of an ID (its first occurrence), in O(log n)."""
+        image_id = str(image_id)
+        pos = bisect_left(self.sorted_ids, image_id)
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == image_id:
+            return self.sorted_rows[pos]
+        return None
+
+    # -------------------------------------------------------------------
+    # Virtual list
+    # -------------------------------------------------------------------
+    def __len__(self):
+        return len(self.ids) if self.view is None else self.view[1] - self.view[0]
+
+    def row_at(self, position) -> int:
+        """CSV row shown at a position of the current (filtered) list."""
+        return position if self.view is None else self.sorted_rows[self.view[0] + position]
+
+    def render(self):
+        total = len(self)
+        self.top = max(0, min(self.top, total - self.visible_rows))
+        shown = range(self.top, min(total, self.top + self.visible_rows))
+
+        self.listbox.delete(0, tk.END)
+        for position in shown:
+            row = self.row_at(position)
+            image_id = self.ids[row]
+            self.listbox.insert(tk.END, image_id + NEW_MARKER if image_id in self.marked else image_id)
+            if row == self.selected_row:
+                self.listbox.selection_set(position - self.top)
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(shown)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, position):
+        self.top = position
+        self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(int(float(args[0]) * len(self)))
+        elif action == "scroll":
+            step = self.visible_rows if args[1] == "pages" else 1
+            self.scroll_by(int(args[0]) * step)
+
+    # -------------------------------------------------------------------
+    # Search + selection
+    # -------------------------------------------------------------------
+    def apply_search(self):
+        prefix = self.search_var.get().strip()
+        if prefix:
+            lo = bisect_left(self.sorted_ids, prefix)
+            hi = bisect_left(self.sorted_ids, prefix + "\U0010ffff", lo)
+            self.view = (lo, hi)
+        else:
+            self.view = None
+        self.top = 0 if prefix else self.top
+        self.render()
+
+    def select_first_match(self, event=None):
+        """Enter: jump to the typed ID if it exists, otherwise to the first ID starting with it."""
+        row = self.find(self.search_var.get().strip())
+        if row is None and len(self):
+            row = self.row_at(0)
+        if row is not None:
+            self.on_select(row)
+
+    def on_click(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self.on_select(self.row_at(self.top + selection[0]))
+
+    def select_row(self, row_idx):
+        """Highlight a CSV row (scrolling it into view when it's in the current list)."""
+        self.selected_row = row_idx
+        if self.view is None:
+            position = row_idx
+        else:
+            lo, hi = self.view
+            image_id = self.ids[row_idx]
+            position = bisect_left(self.sorted_ids, image_id, lo, hi) - lo
+            if not (0 <= position < hi - lo and self.sorted_rows[lo + position] == row_idx):
+                self.render()
+                return
+        if not (self.top <= position < self.top + self.visible_rows):
+            self.top = position - self.visible_rows // 2
+        self.render()
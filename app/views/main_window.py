@@ -79,6 +79,13 @@ class PhotoDataApp(tk.Tk):
         # Start on Main Menu
         self.show_frame("MainMenu")
 
+        # Flush unsaved edits before the window goes away
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        self.frames["MetadataView"].close_csv()
+        self.destroy()
+
     def show_frame(self, page_name):
         self.frames[page_name].tkraise()
 
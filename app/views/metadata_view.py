@@ -3,9 +3,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk, ImageDraw, ImageFont
-import pandas as pd
-from controllers.test_ai_controller import AIController
-
+from utils.photo_index import get_photo_index
+from utils.prefetch import WindowPrefetcher
+from utils.dataset_cache import DatasetCache
+from utils.catalog import open_catalog
+from utils.thumbnail_cache import get_thumbnail_cache
+from utils.edit_recipes import get_recipe_store, is_neutral, photo_id, render_preview
+from views.id_navigator import IdNavigator
+
+PREFETCH_AHEAD = 5
+PREFETCH_BEHIND = 2
+PREFETCH_CACHE_SIZE = 32
+PREFETCH_POLL_MS = 30
+WORKER_POLL_MS = 200
+REVIEW_CACHE_MAX_MB = 512  # loaded CSVs kept in memory at once
+NOT_LOADED = object()
 
 class MetadataView(tk.Frame):
     def __init__(self, parent, app):
@@ -14,9 +26,21 @@ class MetadataView(tk.Frame):
         self.csv_data = None
         self.current_row = 0
         self.csv_path = None
+        self.csv_writer = None  # saves edits in the background, in batches
+        self.csv_files = {}     # dataset name -> CSV path, for every CSV in the review folder
+        self.datasets = DatasetCache(max_bytes=REVIEW_CACHE_MAX_MB * 1024 * 1024)
         self.photo_dir = None
+        self.recipes = None     # cleaning recipes; photos that have one are shown cleaned
         self.tk_image = None
         self.recent_captioned_ids = set()   # ⭐ Newly captioned items
+        self.worker_startup = None  # Future of the caption worker being started in the background
+
+        # Neighbouring rows' thumbnails are loaded on a worker thread, ahead in the direction of travel
+        self.prefetcher = WindowPrefetcher(self.load_thumbnail, capacity=PREFETCH_CACHE_SIZE)
+        self.direction = 1
+        self.waiting_for_image = None  # ID shown as "Loading..." until its thumbnail arrives
+        self.polling = False
+        self.placeholders = {}
 
         # Title
         ttk.Label(self, text="Metadata Tools", font=("Arial", 16, "bold")).pack(pady=20)
@@ -39,10 +63,14 @@ class MetadataView(tk.Frame):
         self.review_frame = ttk.Frame(self)
         self.review_frame.pack(pady=10, fill="both", expand=True)
 
-        # Dropdown for IDs
+        # Dataset picker; each CSV is loaded the first time it is opened
+        self.dataset_label = ttk.Label(self.review_frame, text="Dataset:")
+        self.dataset_combobox = ttk.Combobox(self.review_frame, state="readonly")
+        self.dataset_combobox.bind("<<ComboboxSelected>>", self.on_dataset_selected)
+
+        # Searchable ID list (type a prefix to filter)
         self.id_label = ttk.Label(self.review_frame, text="Select ID:")
-        self.id_combobox = ttk.Combobox(self.review_frame, state="readonly")
-        self.id_combobox.bind("<<ComboboxSelected>>", self.on_id_selected)
+        self.id_navigator = IdNavigator(self.review_frame, on_select=self.show_row)
 
         # NEW — This appears above the image when the item was just captioned
         self.new_tag = ttk.Label(
@@ -81,19 +109,53 @@ class MetadataView(tk.Frame):
     # AI Captioning
     # -------------------------------------------------------------------
     def run_ai_captioner(self):
+        """Start (or reuse) the caption worker off the Tk thread; captioning begins once it answers."""
+        if self.worker_startup is not None:
+            return  # already waiting for the worker
+        from controllers.caption_worker import ensure_worker_in_background
+
+        self.app.status_label.config(text="Starting caption worker...")
+        self.worker_startup = ensure_worker_in_background()
+        self.after(WORKER_POLL_MS, self.poll_caption_worker)
+
+    def poll_caption_worker(self):
+        """Tk-thread hand-off: the window stays responsive while the worker loads its model."""
+        if not self.worker_startup.done():
+            self.after(WORKER_POLL_MS, self.poll_caption_worker)
+            return
+        startup, self.worker_startup = self.worker_startup, None
+        try:
+            captioner = startup.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start the caption worker:\n{e}")
+            self.app.status_label.config(text="Ready")
+            return
+        self.caption_images(captioner)
+
+    def caption_images(self, captioner):
+        """Caption the AI pool with the worker's client (None: load the model in-process)."""
         try:
             self.app.status_label.config(text="Generating AI captions...")
             self.app.update()
 
             test_mode = getattr(self.app, "test_mode", tk.BooleanVar(value=False)).get()
-            controller = AIController(test_mode=test_mode)
+
+            # The captioner rewrites the CSVs; make sure pending review edits are on disk first
+            self.close_csv()
+
+            # Imported here so torch/transformers only load when captioning is requested
+            from controllers.test_ai_controller import AIController
+
+            # Reuse the background worker's loaded model (falls back to in-process loading)
+            controller = AIController(test_mode=test_mode, captioner=captioner)
 
             # ⭐ Get list of newly captioned IDs
             captioned_ids = controller.caption_all_images()
             self.recent_captioned_ids = set(map(str, captioned_ids))
 
             # Load CSV + photos
-            self.load_csv_for_review(controller.data_dir, controller.photo_dir)
+            self.load_csv_for_review(controller.data_dir, controller.photo_dir,
+                                     get_recipe_store(controller.test_mode), open_catalog(controller.test_mode))
 
             messagebox.showinfo(
                 "Success",
@@ -108,74 +170,108 @@ class MetadataView(tk.Frame):
     # -------------------------------------------------------------------
     # Load CSV + UI Setup
     # -------------------------------------------------------------------
-    def load_csv_for_review(self, csv_dir, photo_dir):
-        csv_files = list(csv_dir.glob("*.csv"))
+    def load_csv_for_review(self, csv_dir, photo_dir, recipes=None, catalog=None):
+        csv_files = sorted(csv_dir.glob("*.csv"))
         if not csv_files:
             messagebox.showwarning("No CSVs", f"No CSV files found in {csv_dir}")
             return
 
-        self.csv_path = csv_files[0]
-        self.csv_data = pd.read_csv(self.csv_path)
+        self.close_csv()
+        if self.datasets.catalog is not None and self.datasets.catalog is not catalog:
+            self.datasets.catalog.close()
+        self.datasets.catalog = catalog  # datasets in an enabled catalog are edited there, row by row
+        self.photo_dir = photo_dir
+        self.recipes = recipes
+        self.prefetcher.clear()
 
-        if "ID" not in self.csv_data.columns or "Description" not in self.csv_data.columns:
-            messagebox.showerror("Invalid CSV", "CSV must contain ID and Description")
-            return
+        self.csv_files = {csv_file.stem: csv_file for csv_file in csv_files}
+        self.dataset_combobox["values"] = list(self.csv_files)
+        self.dataset_label.pack()
+        self.dataset_combobox.pack(pady=5)
 
-        self.photo_dir = photo_dir
+        # Show main UI pieces (also when the first CSV can't be opened and another is picked later)
+        self.id_label.pack()
+        self.id_navigator.pack(pady=5)
+        self.image_label.pack(pady=10)
+        self.desc_label.pack()
+        self.desc_entry.pack()
+        self.nav_frame.pack(pady=5)
+
+        # Open the first CSV that loads and has ID and Description
+        for csv_file in csv_files:
+            if self.open_dataset(csv_file.stem):
+                break
+
+    def open_dataset(self, name) -> bool:
+        """Switch the review to another CSV (loaded now if it isn't in memory yet)."""
+        self.save_current_row()
+        path = self.csv_files[name]
+        try:
+            df, writer = self.datasets.get(path)
+        except Exception as e:
+            messagebox.showerror("Invalid CSV", f"Could not read {path.name}:\n{e}")
+            return False
 
-        # Fill dropdown with NEW markers
-        dropdown_values = [
-            f"{str(row['ID'])} ★ NEW" if str(row["ID"]) in self.recent_captioned_ids else str(row["ID"])
-            for _, row in self.csv_data.iterrows()
-        ]
+        if "ID" not in df.columns or "Description" not in df.columns:
+            messagebox.showerror("Invalid CSV", f"{path.name} must contain ID and Description")
+            self.datasets.release(path)
+            return False
 
-        self.id_combobox["values"] = dropdown_values
+        # No writer until the first row is shown, so the old row's text can't land in this CSV
+        self.csv_writer = None
+        self.csv_path, self.csv_data = path, df
+        self.dataset_combobox.set(name)
+
+        # Fill ID list with NEW markers
+        self.id_navigator.set_ids(df["ID"].astype(str), marked=self.recent_captioned_ids)
         self.id_label.pack()
-        self.id_combobox.pack(pady=5)
+        self.id_navigator.pack(pady=5)
 
         # Show row 0
         self.current_row = 0
         self.show_row(0)
+        self.csv_writer = writer
+        return True
 
-        # Show main UI pieces
-        self.image_label.pack(pady=10)
-        self.desc_label.pack()
-        self.desc_entry.pack()
-        self.nav_frame.pack(pady=5)
+    def on_dataset_selected(self, event=None):
+        name = self.dataset_combobox.get()
+        if self.csv_path is not None and name == self.csv_path.stem:
+            return
+        if not self.open_dataset(name) and self.csv_path is not None:
+            self.dataset_combobox.set(self.csv_path.stem)
 
     # -------------------------------------------------------------------
     # Display a single row
     # -------------------------------------------------------------------
     def show_row(self, row_idx):
-        if row_idx < 0 or row_idx >= len(self.csv_data):
+        if self.csv_data is None or row_idx < 0 or row_idx >= len(self.csv_data):
             return
 
         # Save previous before switching
         self.save_current_row()
 
+        if row_idx != self.current_row:
+            self.direction = 1 if row_idx > self.current_row else -1
         self.current_row = row_idx
         row = self.csv_data.iloc[row_idx]
 
         img_id = str(row["ID"])
         description = row["Description"]
 
-        # Select in dropdown
-        dropdown_value = (
-            f"{img_id} ★ NEW" if img_id in self.recent_captioned_ids else img_id
-        )
-        self.id_combobox.set(dropdown_value)
-
-        # Load the image
-        image_files = list(self.photo_dir.glob(f"{img_id}.*"))
-        if image_files:
-            image = Image.open(image_files[0])
-            image.thumbnail((400, 400))
-            self.tk_image = ImageTk.PhotoImage(image)
+        # Select in ID list
+        self.id_navigator.select_row(row_idx)
+
+        # Show the image if it was prefetched; otherwise show a placeholder until the worker delivers it
+        image = self.prefetcher.get(img_id, NOT_LOADED)
+        self.waiting_for_image = None
+        if image is NOT_LOADED and img_id in get_photo_index(self.photo_dir):
+            self.display_image(self.get_placeholder("Loading..."))
+            self.waiting_for_image = img_id
+        elif image is NOT_LOADED or image is None:
+            self.display_image(self.get_placeholder("No Image"))
         else:
-            self.tk_image = self.generate_placeholder_image((400, 400))
-
-        self.image_label.configure(image=self.tk_image)
-        self.image_label.image = self.tk_image
+            self.display_image(ImageTk.PhotoImage(image))
+        self.request_prefetch(row_idx)
 
         # Load description text
         self.desc_entry.delete(0, tk.END)
@@ -184,6 +280,63 @@ class MetadataView(tk.Frame):
         # NEW Highlight if captioned this run
         self.apply_new_highlight(img_id)
 
+    def display_image(self, tk_image):
+        self.tk_image = tk_image
+        self.image_label.configure(image=self.tk_image)
+        self.image_label.image = self.tk_image
+
+    # -------------------------------------------------------------------
+    # Background prefetch
+    # -------------------------------------------------------------------
+    def load_thumbnail(self, img_id):
+        """Runs on the prefetch thread: PIL thumbnail for an ID, or None if it has no photo."""
+        image_path = get_photo_index(self.photo_dir).get(img_id)
+        if not image_path:
+            return None
+        thumb = get_thumbnail_cache().get(image_path, (400, 400))
+        recipe = self.recipes.get(photo_id(image_path)) if self.recipes else None
+        if recipe is None or is_neutral(recipe):
+            return thumb
+
+        # Cleaned photos are previewed by applying their recipe to the thumbnail
+        with Image.open(image_path) as full:
+            scale = thumb.width / full.width
+        preview = render_preview(thumb, recipe, scale)
+        preview.thumbnail((400, 400))
+        return preview
+
+    def request_prefetch(self, row_idx):
+        """Queue the current row, then the next rows in the direction of travel, then a few behind."""
+        rows = [row_idx]
+        rows += [row_idx + self.direction * step for step in range(1, PREFETCH_AHEAD + 1)]
+        rows += [row_idx - self.direction * step for step in range(1, PREFETCH_BEHIND + 1)]
+        ids = self.csv_data["ID"]
+        self.prefetcher.request([str(ids.iat[r]) for r in rows if 0 <= r < len(ids)])
+        if self.waiting_for_image is not None and not self.polling:
+            self.polling = True
+            self.after(PREFETCH_POLL_MS, self.poll_prefetch)
+
+    def poll_prefetch(self):
+        """Tk-thread hand-off: show the current row's image as soon as the worker has it."""
+        ready = self.prefetcher.poll()
+        if self.waiting_for_image is not None:
+            # The cache is the source of truth; ready keys only say a load finished at some point
+            image = self.prefetcher.get(self.waiting_for_image, NOT_LOADED)
+            if image is not NOT_LOADED:
+                self.display_image(ImageTk.PhotoImage(image) if image is not None else self.get_placeholder("No Image"))
+                self.waiting_for_image = None
+            elif self.waiting_for_image in ready:
+                self.request_prefetch(self.current_row)  # loaded but evicted before we got to it
+        if self.waiting_for_image is None:
+            self.polling = False
+            return
+        self.after(PREFETCH_POLL_MS, self.poll_prefetch)
+
+    def get_placeholder(self, text):
+        if text not in self.placeholders:
+            self.placeholders[text] = self.generate_placeholder_image((400, 400), text)
+        return self.placeholders[text]
+
     # -------------------------------------------------------------------
     # Highlighting Newly Captioned Rows
     # -------------------------------------------------------------------
@@ -202,10 +355,9 @@ class MetadataView(tk.Frame):
     # -------------------------------------------------------------------
     # Placeholder Image
     # -------------------------------------------------------------------
-    def generate_placeholder_image(self, size):
+    def generate_placeholder_image(self, size, text="No Image"):
         img = Image.new("RGB", size, color=(200, 200, 200))
         draw = ImageDraw.Draw(img)
-        text = "No Image"
         font = ImageFont.load_default()
 
         bbox = draw.textbbox((0, 0), text, font=font)
@@ -217,24 +369,29 @@ class MetadataView(tk.Frame):
         draw.text((x, y), text, fill=(100, 100, 100), font=font)
         return ImageTk.PhotoImage(img)
 
-    # -------------------------------------------------------------------
-    # Dropdown selection
-    # -------------------------------------------------------------------
-    def on_id_selected(self, event):
-        selected = self.id_combobox.get().replace(" ★ NEW", "")
-        index = self.csv_data.index[self.csv_data["ID"].astype(str) == selected][0]
-        self.show_row(index)
-
     # -------------------------------------------------------------------
     # Navigation
     # -------------------------------------------------------------------
     def save_current_row(self):
-        if self.csv_data is not None and self.csv_path is not None:
-            self.csv_data.at[self.current_row, "Description"] = self.desc_entry.get()
-            self.csv_data.to_csv(self.csv_path, index=False)
+        """Record the edited description; the writer only saves rows that actually changed."""
+        if self.csv_writer is not None:
+            try:
+                self.csv_writer.update(self.current_row, "Description", self.desc_entry.get())
+            except Exception as e:
+                messagebox.showerror("Save Failed", str(e))
+
+    def close_csv(self):
+        """Save the row being edited, then flush and unload every open dataset."""
+        self.save_current_row()
+        self.csv_writer = None
+        self.csv_data = self.csv_path = None
+        try:
+            self.datasets.close()
+        except Exception as e:
+            messagebox.showerror("Save Failed", str(e))
 
     def next_row(self):
-        if self.current_row < len(self.csv_data) - 1:
+        if self.csv_data is not None and self.current_row < len(self.csv_data) - 1:
             self.show_row(self.current_row + 1)
 
     def prev_row(self):